@@ -1,33 +1,82 @@
-from . import pools
+from . import autosize, deadlines, pools, statements
+from .autosize import DbPoolAutosizer, create_db_pool_autosizer
 from .config import Settings, get_settings
 from .constants import (
     CAMEL_TO_SNAKE_REGEX,
+    DB_OBJECT_TYPE_INVALIDATED_REGEX,
     DEFAULT_MAX_ROWS,
+    DEFAULT_STMT_CACHE_SIZE,
     PACKAGE_STATE_INVALIDATED_REGEX,
+    DbObjectRowType,
     DbPoolAndConn,
+    DbPoolAutosizeDecision,
+    DbPoolAutosizeMetrics,
+    DbPoolAutosizeWindow,
     DbPoolConnAndCursor,
+    DbPoolHealth,
     DbPoolKey,
+    DbSessionCallback,
+    DbStatement,
 )
 from .core import (
+    acquire_db_conn,
+    check_db_pool_health,
+    check_db_pool_ready,
+    clear_db_object_types,
     close_db_pools,
+    close_retired_db_pools,
+    db_transaction,
+    gather_db_queries,
     get_db_conn,
+    get_db_conn_with_tag,
     get_db_cursor,
+    get_db_object_type,
     get_db_pool,
+    get_db_pool_autosize_metrics,
+    get_db_pool_health,
+    get_db_pool_key,
     get_or_create_db_pool,
     handle_db_errors,
+    init_db_session,
+    prepare_db_statements,
+    recycle_db_pool,
+    shutdown_db_pools,
+    start_db_pool_autosizer,
+    start_db_pool_monitor,
+    start_db_pools,
+)
+from .deadlines import (
+    DbDeadlineMiddleware,
+    apply_db_deadline,
+    db_deadline,
+    get_db_deadline_remaining_secs,
+    with_db_deadline,
 )
 from .errors import (
     INTERMITTENT_DATABASE_ERROR_CLASSES,
     INTERMITTENT_DATABASE_ERROR_STRING_MAP,
+    DbDeadlineExceededError,
     IntermittentDatabaseError,
     PackageStateInvalidatedError,
     ProgramUnitNotFoundError,
     RecordAttributeCharacterEncodingError,
 )
+from .statements import (
+    DB_STATEMENTS,
+    execute_db_statement,
+    get_db_statement,
+    get_db_stmt_cache_size,
+    register_db_statement,
+)
 from .utils import (
+    build_db_coll,
+    clear_db_object_plans,
     coll_records_as_dicts,
+    coll_records_as_rows,
     cursor_rows_as_dicts,
     cursor_rows_as_gen,
+    db_object_as_python,
+    execute_and_commit,
     result_keys_to_lower,
     row_keys_to_lower,
 )
@@ -35,29 +84,78 @@ from .utils import (
 
 __all__ = [
     "CAMEL_TO_SNAKE_REGEX",
+    "DB_OBJECT_TYPE_INVALIDATED_REGEX",
+    "DB_STATEMENTS",
     "DEFAULT_MAX_ROWS",
+    "DEFAULT_STMT_CACHE_SIZE",
     "INTERMITTENT_DATABASE_ERROR_CLASSES",
     "INTERMITTENT_DATABASE_ERROR_STRING_MAP",
     "PACKAGE_STATE_INVALIDATED_REGEX",
+    "DbDeadlineExceededError",
+    "DbDeadlineMiddleware",
+    "DbObjectRowType",
     "DbPoolAndConn",
+    "DbPoolAutosizeDecision",
+    "DbPoolAutosizeMetrics",
+    "DbPoolAutosizeWindow",
+    "DbPoolAutosizer",
     "DbPoolConnAndCursor",
+    "DbPoolHealth",
     "DbPoolKey",
+    "DbSessionCallback",
+    "DbStatement",
     "IntermittentDatabaseError",
     "PackageStateInvalidatedError",
     "ProgramUnitNotFoundError",
     "RecordAttributeCharacterEncodingError",
     "Settings",
+    "acquire_db_conn",
+    "apply_db_deadline",
+    "autosize",
+    "build_db_coll",
+    "check_db_pool_health",
+    "check_db_pool_ready",
+    "clear_db_object_plans",
+    "clear_db_object_types",
     "close_db_pools",
+    "close_retired_db_pools",
     "coll_records_as_dicts",
+    "coll_records_as_rows",
+    "create_db_pool_autosizer",
     "cursor_rows_as_dicts",
     "cursor_rows_as_gen",
+    "db_deadline",
+    "db_object_as_python",
+    "db_transaction",
+    "deadlines",
+    "execute_and_commit",
+    "execute_db_statement",
+    "gather_db_queries",
     "get_db_conn",
+    "get_db_conn_with_tag",
     "get_db_cursor",
+    "get_db_deadline_remaining_secs",
+    "get_db_object_type",
     "get_db_pool",
+    "get_db_pool_autosize_metrics",
+    "get_db_pool_health",
+    "get_db_pool_key",
+    "get_db_statement",
+    "get_db_stmt_cache_size",
     "get_or_create_db_pool",
     "get_settings",
     "handle_db_errors",
+    "init_db_session",
     "pools",
+    "prepare_db_statements",
+    "recycle_db_pool",
+    "register_db_statement",
     "result_keys_to_lower",
     "row_keys_to_lower",
+    "shutdown_db_pools",
+    "start_db_pool_autosizer",
+    "start_db_pool_monitor",
+    "start_db_pools",
+    "statements",
+    "with_db_deadline",
 ]
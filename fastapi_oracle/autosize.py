@@ -0,0 +1,223 @@
+import math
+import time
+from collections import deque
+
+from fastapi_oracle.config import Settings
+from fastapi_oracle.constants import (
+    DB_POOL_AUTOSIZE_DECISIONS_KEPT,
+    DB_POOL_AUTOSIZE_GROW_AFTER_WINDOWS,
+    DB_POOL_AUTOSIZE_LOW_UTILIZATION,
+    DB_POOL_AUTOSIZE_SHRINK_AFTER_WINDOWS,
+    DEFAULT_POOL_AUTOSIZE_ACQUIRE_WAIT_MS,
+    DbPoolAutosizeDecision,
+    DbPoolAutosizeMetrics,
+    DbPoolAutosizeWindow,
+)
+
+
+class DbPoolAutosizer:
+    """Decides when to resize a DB connection pool, from how long acquiring a
+    connection takes and from how much of the pool is in use.
+
+    Acquire waits and utilization get recorded for the current window, which is closed
+    by each call to evaluate(). The pool is grown (by half, at least by step) after
+    grow_after_windows windows in a row whose mean acquire wait is over the threshold,
+    and it's shrunk (by step, keeping step spare connections above the peak in use)
+    after shrink_after_windows windows in a row whose peak utilization is under
+    low_utilization. Both counts start over after each resize, and the size always
+    stays within the limits.
+    """
+
+    def __init__(
+        self,
+        max_size: int,
+        min_size_limit: int,
+        max_size_limit: int,
+        step: int = 1,
+        acquire_wait_ms: float = DEFAULT_POOL_AUTOSIZE_ACQUIRE_WAIT_MS,
+        low_utilization: float = DB_POOL_AUTOSIZE_LOW_UTILIZATION,
+        grow_after_windows: int = DB_POOL_AUTOSIZE_GROW_AFTER_WINDOWS,
+        shrink_after_windows: int = DB_POOL_AUTOSIZE_SHRINK_AFTER_WINDOWS,
+    ):
+        self.max_size = max_size
+        self.min_size_limit = min_size_limit
+        self.max_size_limit = max_size_limit
+        self.step = step
+        self.acquire_wait_ms = acquire_wait_ms
+        self.low_utilization = low_utilization
+        self.grow_after_windows = grow_after_windows
+        self.shrink_after_windows = shrink_after_windows
+
+        self.hot_windows = 0
+        self.cool_windows = 0
+        self.grows = 0
+        self.shrinks = 0
+        self.last_window: DbPoolAutosizeWindow | None = None
+        self.decisions: deque[DbPoolAutosizeDecision] = deque(
+            maxlen=DB_POOL_AUTOSIZE_DECISIONS_KEPT
+        )
+
+        # Peak number of connections in use over the current run of cool windows
+        self._cool_peak_busy = 0
+
+        self._reset_window()
+
+    def _reset_window(self):
+        self._acquires = 0
+        self._acquire_wait_secs_total = 0.0
+        self._acquire_wait_secs_max = 0.0
+        self._peak_utilization = 0.0
+
+    def _record_utilization(self, busy: int, max_size: int):
+        if max_size:
+            self._peak_utilization = max(self._peak_utilization, busy / max_size)
+
+    def record_acquire(
+        self, wait_secs: float, busy: int, max_size: int, at_capacity: bool = True
+    ):
+        """Record how long acquiring a connection took, and how many of the pool's
+        connections were in use once it was acquired.
+
+        at_capacity is whether all of the pool's connections were in use when the
+        acquire started. If they weren't, then the acquire wasn't waiting for a free
+        connection, it was opening one (e.g. right after the pool got resized), which a
+        bigger pool wouldn't have made any quicker, so it counts as no wait.
+        """
+        if not at_capacity:
+            wait_secs = 0.0
+
+        self._acquires += 1
+        self._acquire_wait_secs_total += wait_secs
+        self._acquire_wait_secs_max = max(self._acquire_wait_secs_max, wait_secs)
+        self._record_utilization(busy, max_size)
+
+    def _close_window(self, busy: int, max_size: int) -> DbPoolAutosizeWindow:
+        self._record_utilization(busy, max_size)
+        window = DbPoolAutosizeWindow(
+            acquires=self._acquires,
+            mean_acquire_wait_ms=(
+                self._acquire_wait_secs_total / self._acquires * 1000
+                if self._acquires
+                else 0.0
+            ),
+            max_acquire_wait_ms=self._acquire_wait_secs_max * 1000,
+            peak_utilization=self._peak_utilization,
+        )
+        self._reset_window()
+        self.last_window = window
+
+        return window
+
+    def evaluate(self, busy: int, max_size: int) -> DbPoolAutosizeDecision | None:
+        """Close the current window, and decide whether the pool should be resized.
+
+        Takes how many of the pool's connections are in use right now, and the pool's
+        actual max size. Returns the decision if the pool should be resized (to the
+        decision's new_max_size, which max_size is then updated to), otherwise None.
+        """
+        window = self._close_window(busy, max_size)
+
+        if window.mean_acquire_wait_ms > self.acquire_wait_ms:
+            self.hot_windows += 1
+            self.cool_windows = 0
+            self._cool_peak_busy = 0
+        elif window.peak_utilization < self.low_utilization:
+            self.hot_windows = 0
+            self.cool_windows += 1
+            self._cool_peak_busy = max(
+                self._cool_peak_busy, math.ceil(window.peak_utilization * max_size)
+            )
+        else:
+            self.hot_windows = 0
+            self.cool_windows = 0
+            self._cool_peak_busy = 0
+
+        new_max_size = self.max_size
+
+        if self.hot_windows >= self.grow_after_windows:
+            new_max_size = min(
+                self.max_size + max(self.step, self.max_size // 2),
+                self.max_size_limit,
+            )
+            reason = (
+                f"mean acquire wait of {window.mean_acquire_wait_ms:.1f}ms was over "
+                f"{self.acquire_wait_ms:.1f}ms for {self.hot_windows} windows"
+            )
+        elif self.cool_windows >= self.shrink_after_windows:
+            new_max_size = min(
+                max(
+                    self.max_size - self.step,
+                    self._cool_peak_busy + self.step,
+                    self.min_size_limit,
+                ),
+                self.max_size,
+            )
+            reason = (
+                f"peak utilization was under {self.low_utilization:.0%} for "
+                f"{self.cool_windows} windows"
+            )
+
+        if new_max_size == self.max_size:
+            return None
+
+        decision = DbPoolAutosizeDecision(
+            decided_time=time.monotonic(),
+            old_max_size=self.max_size,
+            new_max_size=new_max_size,
+            reason=reason,
+            window=window,
+        )
+        self.decisions.append(decision)
+
+        if new_max_size > self.max_size:
+            self.grows += 1
+        else:
+            self.shrinks += 1
+
+        self.max_size = new_max_size
+        self.hot_windows = 0
+        self.cool_windows = 0
+        self._cool_peak_busy = 0
+
+        return decision
+
+    def get_metrics(self) -> DbPoolAutosizeMetrics:
+        """Get the current size and limits, and the recent resize decisions."""
+        return DbPoolAutosizeMetrics(
+            max_size=self.max_size,
+            min_size_limit=self.min_size_limit,
+            max_size_limit=self.max_size_limit,
+            hot_windows=self.hot_windows,
+            cool_windows=self.cool_windows,
+            grows=self.grows,
+            shrinks=self.shrinks,
+            last_window=self.last_window,
+            decisions=tuple(self.decisions),
+        )
+
+
+def create_db_pool_autosizer(settings: Settings, max_size: int) -> DbPoolAutosizer:
+    """Create an autosizer for a DB connection pool whose max size is max_size.
+
+    The size limits default to db_pool_min_size (or 1) and to db_pool_max_size (or,
+    if that's not set, double the initial size), and they're widened if need be to
+    take in the initial size.
+    """
+    min_size_limit = (
+        settings.db_pool_autosize_min_size or settings.db_pool_min_size or 1
+    )
+    max_size_limit = (
+        settings.db_pool_autosize_max_size or settings.db_pool_max_size or max_size * 2
+    )
+
+    return DbPoolAutosizer(
+        max_size=max_size,
+        min_size_limit=max(min(min_size_limit, max_size), 1),
+        max_size_limit=max(max_size_limit, max_size),
+        step=settings.db_pool_increment or 1,
+        acquire_wait_ms=(
+            settings.db_pool_autosize_acquire_wait_ms
+            if settings.db_pool_autosize_acquire_wait_ms is not None
+            else DEFAULT_POOL_AUTOSIZE_ACQUIRE_WAIT_MS
+        ),
+    )
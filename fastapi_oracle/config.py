@@ -17,6 +17,16 @@ class Settings(BaseSettings):
     db_pool_conn_timeout: int | None = None
     db_encoding_error_handler_name: str | None = None
     db_call_timeout_secs: int | None = None
+    db_stmt_cache_size: int | None = None
+    db_session_tag: str | None = None
+    db_health_check_interval_secs: int | None = None
+    db_fan_out_max_parallel: int | None = None
+    db_request_timeout_secs: float | None = None
+    db_shutdown_grace_secs: float | None = None
+    db_pool_autosize_interval_secs: float | None = None
+    db_pool_autosize_min_size: int | None = None
+    db_pool_autosize_max_size: int | None = None
+    db_pool_autosize_acquire_wait_ms: float | None = None
 
 
 @lru_cache()
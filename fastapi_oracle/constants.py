@@ -1,5 +1,6 @@
 import re
-from typing import NamedTuple
+from collections.abc import Awaitable, Callable, Mapping, Sequence
+from typing import Any, Literal, NamedTuple
 
 from oracledb import AsyncConnection, AsyncConnectionPool, AsyncCursor
 
@@ -27,11 +28,94 @@ class DbPoolAndCreatedTime(NamedTuple):
     created_time: float
 
 
+class DbPoolHealth(NamedTuple):
+    healthy: bool
+    checked_time: float
+    error: str | None = None
+
+
+class DbPoolAutosizeWindow(NamedTuple):
+    acquires: int
+    mean_acquire_wait_ms: float
+    max_acquire_wait_ms: float
+    peak_utilization: float
+
+
+class DbPoolAutosizeDecision(NamedTuple):
+    decided_time: float
+    old_max_size: int
+    new_max_size: int
+    reason: str
+    window: DbPoolAutosizeWindow
+
+
+class DbPoolAutosizeMetrics(NamedTuple):
+    max_size: int
+    min_size_limit: int
+    max_size_limit: int
+    hot_windows: int
+    cool_windows: int
+    grows: int
+    shrinks: int
+    last_window: DbPoolAutosizeWindow | None
+    decisions: tuple[DbPoolAutosizeDecision, ...]
+
+
+class DbStatement(NamedTuple):
+    name: str
+    sql: str
+    bind_types: Mapping[str, Any] | Sequence[Any] | None = None
+    arraysize: int | None = None
+    prefetchrows: int | None = None
+    row_model: type | None = None
+
+
+# Called with the connection and the requested tag, see core.init_db_session()
+DbSessionCallback = Callable[[AsyncConnection, str | None], Awaitable[None]]
+
+
+# What records get converted into, see utils.db_object_as_python()
+DbObjectRowType = Literal["dict", "tuple", "record"]
+
+
 DEFAULT_MAX_ROWS = 10_000
 
+# How long the health check waits for an idle connection, in case a request has just
+# taken the last one, see core.check_db_pool_health()
+DB_POOL_HEALTH_CHECK_ACQUIRE_SECS = 0.5
+
+# How often to check whether busy connections have been released, when waiting for
+# the DB connection pools to drain before closing them
+DB_POOL_DRAIN_POLL_SECS = 0.1
+
+# Mean time that acquiring a connection may take, over a window, before the DB
+# connection pool counts as too small, see autosize.DbPoolAutosizer
+DEFAULT_POOL_AUTOSIZE_ACQUIRE_WAIT_MS = 50.0
+
+# Peak share of the DB connection pool's connections in use, over a window, below
+# which the pool counts as too big
+DB_POOL_AUTOSIZE_LOW_UTILIZATION = 0.5
+
+# How many windows in a row the DB connection pool has to be too small, or too big,
+# before it gets resized. Shrinking is slower to kick in than growing, so that the
+# size doesn't flap between bursts of traffic
+DB_POOL_AUTOSIZE_GROW_AFTER_WINDOWS = 2
+DB_POOL_AUTOSIZE_SHRINK_AFTER_WINDOWS = 6
+
+# How many of the most recent resize decisions are kept for the metrics
+DB_POOL_AUTOSIZE_DECISIONS_KEPT = 20
+
+# Same as the python-oracledb default statement cache size, used as headroom for ad-hoc
+# statements on top of the statements in the registry
+DEFAULT_STMT_CACHE_SIZE = 20
+
 # Thanks to: https://stackoverflow.com/a/1176023/2066849
 CAMEL_TO_SNAKE_REGEX = re.compile(r"(?<!^)(?=[A-Z])")
 
+# Errors indicating that a DB object type no longer exists or has been changed, matched
+# against the lowercased error message
+DB_OBJECT_TYPE_INVALIDATED_REGEX = re.compile(r"\bora-(04043|21700|22303|22337)\b")
+
 PACKAGE_STATE_INVALIDATED_REGEX = re.compile(
     r'existing state of package body "[^"]+" has been invalidated'
 )
@@ -1,40 +1,68 @@
+import asyncio
 import time
+from contextlib import AsyncExitStack, asynccontextmanager
 from functools import wraps
 from re import Pattern
-from typing import AsyncGenerator, Awaitable, Callable, ParamSpec, TypeVar
+from typing import (
+    AsyncGenerator,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Iterable,
+    ParamSpec,
+    TypeVar,
+)
 
 from fastapi import Depends
 from loguru import logger
 from oracledb import (
     DB_TYPE_VARCHAR,
     SPOOL_ATTRVAL_TIMEDWAIT,
+    AsyncConnection,
     AsyncConnectionPool,
     DatabaseError,
+    DbObjectType,
     InterfaceError,
     create_pool_async,
     makedsn,
 )
 
 from fastapi_oracle import pools
+from fastapi_oracle.autosize import create_db_pool_autosizer
 from fastapi_oracle.config import Settings, get_settings
 from fastapi_oracle.constants import (
     CAMEL_TO_SNAKE_REGEX,
+    DB_OBJECT_TYPE_INVALIDATED_REGEX,
+    DB_POOL_DRAIN_POLL_SECS,
+    DB_POOL_HEALTH_CHECK_ACQUIRE_SECS,
     DbPoolAndConn,
     DbPoolAndCreatedTime,
+    DbPoolAutosizeMetrics,
     DbPoolConnAndCursor,
+    DbPoolHealth,
     DbPoolKey,
+    DbSessionCallback,
 )
-from fastapi_oracle.errors import IntermittentDatabaseError
+from fastapi_oracle.deadlines import apply_db_deadline, get_db_deadline_remaining_secs
+from fastapi_oracle.errors import DbDeadlineExceededError, IntermittentDatabaseError
+from fastapi_oracle.statements import DB_STATEMENTS, get_db_stmt_cache_size
+from fastapi_oracle.utils import clear_db_object_plans
 
 
 P = ParamSpec("P")
 T = TypeVar("T")
 
 
-async def close_db_pool(pool: AsyncConnectionPool):  # pragma: no cover
-    """Close the DB connection pool."""
+async def close_db_pool(
+    pool: AsyncConnectionPool, force: bool = False
+):  # pragma: no cover
+    """Close the DB connection pool.
+
+    If force is True, then busy connections get closed too, instead of the close
+    failing.
+    """
     try:
-        await pool.close()
+        await pool.close(force=force)
     except (DatabaseError, InterfaceError) as ex:
         if "while trying to destroy the Session Pool" in f"{ex}":
             logger.warning(
@@ -72,17 +100,40 @@ async def close_db_pool(pool: AsyncConnectionPool):  # pragma: no cover
             raise ex
 
 
-async def get_or_create_db_pool(
-    settings: Settings,
-) -> AsyncConnectionPool:  # pragma: no cover
-    """Get or create the DB connection pool."""
-    pool_key = DbPoolKey(
+def get_db_pool_key(settings: Settings) -> DbPoolKey:
+    """Get the key that the DB connection pool for the specified settings is cached
+    under.
+    """
+    return DbPoolKey(
         settings.db_host,
         settings.db_port,
         settings.db_user,
         settings.db_service_name,
     )
 
+
+async def get_or_create_db_pool(
+    settings: Settings,
+    session_callback: DbSessionCallback | None = None,
+) -> AsyncConnectionPool:  # pragma: no cover
+    """Get or create the DB connection pool.
+
+    If a session callback is specified, it's remembered for the pool (including for
+    when the pool gets re-created), see init_db_session() for when it's called. Call
+    this with the session callback on app startup, so that it's in place before the
+    first connection gets acquired.
+    """
+    if pools.DB_POOLS_SHUTTING_DOWN:
+        raise IntermittentDatabaseError(
+            "The database connection pools are shutting down, please try this call "
+            "again soon"
+        )
+
+    pool_key = get_db_pool_key(settings)
+
+    if session_callback is not None:
+        pools.DB_SESSION_CALLBACKS[pool_key] = session_callback
+
     if pools.DB_POOLS.get(pool_key) is not None:
         ttl = settings.db_conn_ttl
         pool, created_time = pools.DB_POOLS[pool_key]
@@ -93,9 +144,30 @@ async def get_or_create_db_pool(
                 f"than {ttl} seconds"
             )
             await close_db_pool(pool)
+            pools.DB_OBJECT_TYPES.pop(pool, None)
         else:
             return pool
 
+    autosizer = pools.DB_POOL_AUTOSIZERS.get(pool_key)
+    pool = _create_db_pool(
+        settings, max_size=autosizer.max_size if autosizer is not None else None
+    )
+    pools.DB_POOLS[pool_key] = DbPoolAndCreatedTime(
+        pool=pool, created_time=time.monotonic()
+    )
+    pools.DB_SESSION_TAGS[pool_key] = {}
+
+    if settings.db_health_check_interval_secs is not None:
+        start_db_pool_monitor(pool_key, settings.db_health_check_interval_secs)
+    if settings.db_pool_autosize_interval_secs is not None:
+        start_db_pool_autosizer(pool_key, settings, pool.max)
+
+    return pools.DB_POOLS[pool_key].pool
+
+
+def _create_db_pool(
+    settings: Settings, max_size: int | None = None
+) -> AsyncConnectionPool:  # pragma: no cover
     dsn = makedsn(
         host=settings.db_host,
         port=settings.db_port,
@@ -111,22 +183,332 @@ async def get_or_create_db_pool(
         create_pool_kwargs["min"] = settings.db_pool_min_size
     if settings.db_pool_max_size is not None:
         create_pool_kwargs["max"] = settings.db_pool_max_size
+    if max_size is not None:
+        # Size arrived at by the pool's autosizer, the min size can't be more than it
+        create_pool_kwargs["max"] = max_size
+        create_pool_kwargs["min"] = min(create_pool_kwargs.get("min", 1), max_size)
     if settings.db_pool_increment is not None:
         create_pool_kwargs["increment"] = settings.db_pool_increment
     if settings.db_pool_conn_timeout is not None:
         create_pool_kwargs["timeout"] = settings.db_pool_conn_timeout
+    if (stmt_cache_size := get_db_stmt_cache_size(settings)) is not None:
+        create_pool_kwargs["stmtcachesize"] = stmt_cache_size
 
-    pool = create_pool_async(
+    return create_pool_async(
         user=settings.db_user,
         password=settings.db_password,
         dsn=dsn,
         **create_pool_kwargs,
     )
+
+
+async def init_db_session(
+    pool: AsyncConnectionPool,
+    conn: AsyncConnection,
+    settings: Settings,
+    tag: str | None = None,
+):
+    """Initialize the session of the specified DB connection, if it needs it.
+
+    Calls the pool's session callback (if it has one) only when the session is new, or
+    when it was last initialized for a different tag, so that session setup (e.g.
+    ALTER SESSION calls) doesn't cost a round trip on every acquisition. The tag of
+    each session is tracked here rather than by the driver, because python-oracledb
+    ignores tags when acquiring from a pool in Thin mode.
+    """
+    pool_key = get_db_pool_key(settings)
+    session_callback = pools.DB_SESSION_CALLBACKS.get(pool_key)
+
+    if session_callback is None:
+        return
+
+    session_tags = pools.DB_SESSION_TAGS.setdefault(pool_key, {})
+    session_key = (conn.session_id, conn.serial_num)
+
+    if session_key in session_tags and session_tags[session_key] == tag:
+        return
+
+    await session_callback(conn, tag)
+
+    # Sessions that have been closed by the pool are never removed individually, so
+    # start afresh once there are more sessions tracked than the pool could hold
+    if len(session_tags) >= max(pool.max, 1) * 2:
+        session_tags.clear()
+
+    session_tags[session_key] = tag
+
+
+async def check_db_pool_health(
+    pool: AsyncConnectionPool, timeout_secs: float
+) -> DbPoolHealth | None:
+    """Check the health of the DB connection pool, by pinging its idle connections.
+
+    Only idle connections get pinged, and they're all held (and pinged) at the same
+    time, so that each one gets pinged. Connections that fail the ping are dropped from
+    the pool, so that the pool replaces them, instead of a request finding out that
+    they're dead.
+
+    Requests always come first: the check stops taking connections as soon as there
+    are no idle ones left, and if a request beats it to the last idle connection, it
+    gives up waiting after DB_POOL_HEALTH_CHECK_ACQUIRE_SECS. Returns None (i.e. no
+    result) if nothing got pinged because all of the connections are busy.
+    """
+    conns: list = []
+    dead_conns: list = []
+
+    try:
+        # If the pool has no connections yet, then the acquire is what opens one, so
+        # it gets the full timeout
+        while not pool.opened or pool.busy < pool.opened:
+            try:
+                conns.append(
+                    await asyncio.wait_for(
+                        pool.acquire(),
+                        (
+                            min(timeout_secs, DB_POOL_HEALTH_CHECK_ACQUIRE_SECS)
+                            if pool.opened
+                            else timeout_secs
+                        ),
+                    )
+                )
+            except asyncio.TimeoutError:
+                if conns or pool.busy:
+                    break
+
+                return DbPoolHealth(
+                    healthy=False, checked_time=time.monotonic(), error="timeout"
+                )
+            except (DatabaseError, InterfaceError) as ex:
+                return DbPoolHealth(
+                    healthy=False, checked_time=time.monotonic(), error=f"{ex}"
+                )
+
+        if not conns:
+            return None
+
+        results = await asyncio.gather(
+            *(asyncio.wait_for(conn.ping(), timeout_secs) for conn in conns),
+            return_exceptions=True,
+        )
+        error = None
+
+        for conn, result in zip(conns, results):
+            if isinstance(result, BaseException):
+                logger.warning(
+                    "Database connection failed health check ping, dropping it: "
+                    f"{result}"
+                )
+                dead_conns.append(conn)
+                error = error or f"{result}" or "timeout"
+
+        if error is not None:
+            return DbPoolHealth(
+                healthy=False, checked_time=time.monotonic(), error=error
+            )
+
+        return DbPoolHealth(healthy=True, checked_time=time.monotonic())
+    finally:
+        # Every connection that the check is holding goes back, even if the check
+        # got cancelled part way through, and even if giving one of them back fails
+        results = await asyncio.gather(
+            *(
+                pool.drop(conn) if conn in dead_conns else pool.release(conn)
+                for conn in conns
+            ),
+            return_exceptions=True,
+        )
+
+        for result in results:
+            if isinstance(result, BaseException):
+                logger.warning(
+                    "Failed to give a database connection back to the pool after "
+                    f"its health check: {result}"
+                )
+
+
+async def _monitor_db_pool(
+    pool_key: DbPoolKey, interval_secs: float
+):  # pragma: no cover
+    while True:
+        await asyncio.sleep(interval_secs)
+
+        if (pool_and_created_time := pools.DB_POOLS.get(pool_key)) is None:
+            continue
+
+        try:
+            health = await check_db_pool_health(
+                pool_and_created_time.pool, interval_secs
+            )
+        except Exception as ex:
+            logger.exception(f"Database connection pool health check failed: {ex}")
+            health = DbPoolHealth(
+                healthy=False, checked_time=time.monotonic(), error=f"{ex}"
+            )
+
+        if health is not None:
+            pools.DB_POOL_HEALTH[pool_key] = health
+
+
+def start_db_pool_monitor(
+    pool_key: DbPoolKey, interval_secs: float
+):  # pragma: no cover
+    """Start the background health monitor of the DB connection pool.
+
+    This gets called when the pool is created (if db_health_check_interval_secs is
+    set), so it shouldn't need to be called manually. It's a no-op if the monitor is
+    already running. The monitor keeps running when the pool gets re-created, and it
+    gets stopped by close_db_pools().
+    """
+    task = pools.DB_POOL_MONITORS.get(pool_key)
+
+    if task is not None and not task.done():
+        return
+
+    pools.DB_POOL_MONITORS[pool_key] = asyncio.create_task(
+        _monitor_db_pool(pool_key, interval_secs)
+    )
+
+
+async def get_db_pool_health(
+    settings: Settings = Depends(get_settings),
+) -> DbPoolHealth | None:
+    """Get the health of the DB connection pool, as last checked by its monitor.
+
+    Returns None if the health is not known, i.e. if the pool hasn't been created or
+    hasn't been checked yet. This never touches the pool itself, so it's cheap enough
+    for liveness probes.
+
+    Suitable for use as a FastAPI path operation with depends().
+    """
+    return pools.DB_POOL_HEALTH.get(get_db_pool_key(settings))
+
+
+async def check_db_pool_ready(
+    health: DbPoolHealth | None = Depends(get_db_pool_health),
+) -> DbPoolHealth | None:
+    """Check that the DB connection pool is ready for traffic.
+
+    Raises an IntermittentDatabaseError if the pool's monitor found it to be
+    unhealthy. A pool whose health is not known is considered to be ready, as it gets
+    created (and then monitored) by the first request that needs it.
+
+    Suitable for use as a FastAPI path operation with depends(), e.g. for readiness
+    probes.
+    """
+    if health is not None and not health.healthy:
+        raise IntermittentDatabaseError(
+            f"The database connection pool is unhealthy: {health.error}"
+        )
+
+    return health
+
+
+def recycle_db_pool(pool_key: DbPoolKey, settings: Settings, max_size: int):
+    """Replace the DB connection pool with a new pool whose max size is max_size.
+
+    python-oracledb async pools can't be resized in place, so this is how a pool gets
+    resized. Connections acquired from here on come from the new pool (even if they're
+    acquired via acquire_db_conn() from the old pool), and the old pool is retired,
+    i.e. it's closed once all of its connections have been released (see
+    close_retired_db_pools()).
+    """
+    pool = _create_db_pool(settings, max_size=max_size)
+
+    if (pool_and_created_time := pools.DB_POOLS.get(pool_key)) is not None:
+        pools.DB_RETIRED_POOLS.append((pool_key, pool_and_created_time.pool))
+        pools.DB_OBJECT_TYPES.pop(pool_and_created_time.pool, None)
+
     pools.DB_POOLS[pool_key] = DbPoolAndCreatedTime(
         pool=pool, created_time=time.monotonic()
     )
 
-    return pools.DB_POOLS[pool_key].pool
+
+async def close_retired_db_pools():
+    """Close the retired DB connection pools that no longer have busy connections.
+
+    This gets called by each pool's autosizer, so it shouldn't need to be called
+    manually. Retired pools that still have busy connections are left until next time.
+    """
+    idle_pools = [
+        pool for _, pool in pools.DB_RETIRED_POOLS if not _get_db_pool_busy(pool)
+    ]
+
+    if not idle_pools:
+        return
+
+    pools.DB_RETIRED_POOLS = [
+        (pool_key, pool)
+        for pool_key, pool in pools.DB_RETIRED_POOLS
+        if pool not in idle_pools
+    ]
+    await asyncio.gather(*(close_db_pool(pool) for pool in idle_pools))
+
+
+async def _autosize_db_pool(pool_key: DbPoolKey, settings: Settings):
+    autosizer = pools.DB_POOL_AUTOSIZERS[pool_key]
+
+    while True:
+        await asyncio.sleep(settings.db_pool_autosize_interval_secs or 0)
+
+        try:
+            await close_retired_db_pools()
+
+            if (pool_and_created_time := pools.DB_POOLS.get(pool_key)) is None:
+                continue
+
+            pool = pool_and_created_time.pool
+            decision = autosizer.evaluate(_get_db_pool_busy(pool), pool.max)
+
+            if decision is None:
+                continue
+
+            logger.info(
+                "Resizing the database connection pool from "
+                f"{decision.old_max_size} to {decision.new_max_size} connections, "
+                f"because the {decision.reason}"
+            )
+            recycle_db_pool(pool_key, settings, decision.new_max_size)
+        except Exception as ex:
+            logger.exception(f"Database connection pool autosizing failed: {ex}")
+
+
+def start_db_pool_autosizer(pool_key: DbPoolKey, settings: Settings, max_size: int):
+    """Start the background autosizer of the DB connection pool.
+
+    This gets called when the pool is created (if db_pool_autosize_interval_secs is
+    set), so it shouldn't need to be called manually. It's a no-op if the autosizer is
+    already running. The size that the autosizer arrives at is kept when the pool gets
+    re-created, and the autosizer gets stopped by close_db_pools().
+    """
+    if pool_key not in pools.DB_POOL_AUTOSIZERS:
+        pools.DB_POOL_AUTOSIZERS[pool_key] = create_db_pool_autosizer(
+            settings, max_size
+        )
+
+    task = pools.DB_POOL_AUTOSIZE_TASKS.get(pool_key)
+
+    if task is not None and not task.done():
+        return
+
+    pools.DB_POOL_AUTOSIZE_TASKS[pool_key] = asyncio.create_task(
+        _autosize_db_pool(pool_key, settings)
+    )
+
+
+async def get_db_pool_autosize_metrics(
+    settings: Settings = Depends(get_settings),
+) -> DbPoolAutosizeMetrics | None:
+    """Get the current size of the DB connection pool, as decided by its autosizer,
+    along with the autosizer's recent resize decisions.
+
+    Returns None if the pool isn't being autosized (yet). This never touches the pool
+    itself.
+
+    Suitable for use as a FastAPI path operation with depends().
+    """
+    autosizer = pools.DB_POOL_AUTOSIZERS.get(get_db_pool_key(settings))
+
+    return autosizer.get_metrics() if autosizer is not None else None
 
 
 async def get_db_pool(
@@ -142,55 +524,226 @@ async def get_db_pool(
     return (await get_or_create_db_pool(settings), settings)
 
 
+@asynccontextmanager
+async def acquire_db_conn(
+    pool: AsyncConnectionPool,
+    settings: Settings,
+    tag: str | None = None,
+) -> AsyncIterator[DbPoolAndConn]:  # pragma: no cover
+    """Acquire a DB connection from the specified pool, and set it up for use.
+
+    This is what get_db_conn() uses under the hood, it's also usable directly, for
+    acquiring connections outside of FastAPI dependencies.
+
+    Raises a DbDeadlineExceededError straight away if the deadline for DB calls (see
+    deadlines.db_deadline()) has already passed, or as soon as it passes while waiting
+    for a connection.
+    """
+    remaining_secs = get_db_deadline_remaining_secs()
+
+    if remaining_secs is not None and remaining_secs <= 0:
+        raise DbDeadlineExceededError(
+            "The deadline for database calls has passed, not acquiring a connection"
+        )
+
+    pool_key = get_db_pool_key(settings)
+
+    # The caller might have got hold of the pool before it was retired (see
+    # recycle_db_pool()), and retired pools get closed as soon as they're idle, so the
+    # connection comes from the pool that replaced it instead
+    if (
+        any(pool is retired_pool for _, retired_pool in pools.DB_RETIRED_POOLS)
+        and (pool_and_created_time := pools.DB_POOLS.get(pool_key)) is not None
+    ):
+        pool = pool_and_created_time.pool
+
+    autosizer = pools.DB_POOL_AUTOSIZERS.get(pool_key)
+    at_capacity = autosizer is not None and pool.busy >= pool.max
+    acquire_started_time = time.monotonic()
+
+    try:
+        conn = await asyncio.wait_for(pool.acquire(tag=tag), remaining_secs)
+    except asyncio.TimeoutError:
+        raise DbDeadlineExceededError(
+            "The deadline for database calls passed while waiting for a connection"
+        )
+
+    try:
+        if autosizer is not None:
+            autosizer.record_acquire(
+                time.monotonic() - acquire_started_time,
+                pool.busy,
+                pool.max,
+                at_capacity=at_capacity,
+            )
+
+        if settings.db_encoding_error_handler_name is not None:
+
+            def output_type_handler(cursor, name, default_type, size, precision, scale):
+                if default_type == DB_TYPE_VARCHAR:
+                    return cursor.var(
+                        default_type,
+                        size,
+                        arraysize=cursor.arraysize,
+                        encoding_errors=settings.db_encoding_error_handler_name,
+                    )
+
+            conn.outputtypehandler = output_type_handler
+
+        # Always set, so that a call timeout shortened by a deadline doesn't carry over
+        # to the next time that the connection is acquired
+        apply_db_deadline(conn, (settings.db_call_timeout_secs or 0) * 1000)
+
+        await init_db_session(pool, conn, settings, tag=tag)
+
+        yield DbPoolAndConn(pool=pool, conn=conn)
+    finally:
+        # Only errors from releasing the connection are suppressed, errors raised while
+        # the connection was being used are always passed on. Closing a pooled
+        # connection releases it, same as pool.release(), except that it doesn't fail
+        # if the pool has been closed in the meantime.
+        try:
+            await conn.close()
+        except (DatabaseError, RuntimeError) as ex:
+            if "not connected" in f"{ex}":
+                logger.warning(
+                    '"not connected" was raised when releasing the database '
+                    "connection - this can happen when the pool has already been "
+                    "closed - assuming that that's what happened in this case, "
+                    "therefore suppressing this error, so that consuming code can "
+                    "continue gracefully"
+                )
+            elif "handler is closed" in f"{ex}":
+                logger.warning(
+                    '"handler is closed" was raised when releasing the database '
+                    "connection - this can happen when the pool has already been "
+                    "closed - assuming that that's what happened in this case, "
+                    "therefore suppressing this error, so that consuming code can "
+                    "continue gracefully"
+                )
+            else:
+                raise ex
+
+
 async def get_db_conn(
     pool_and_settings: tuple[AsyncConnectionPool, Settings] = Depends(get_db_pool),
 ) -> AsyncGenerator[DbPoolAndConn, None]:  # pragma: no cover
     """Get a DB connection.
 
+    The connection's session is initialized for the tag in the db_session_tag setting
+    (if any), see get_db_conn_with_tag() for acquiring with other tags.
+
     Suitable for use as a FastAPI path operation with depends().
     """
     pool, settings = pool_and_settings
 
+    async with acquire_db_conn(pool, settings, tag=settings.db_session_tag) as db:
+        yield db
+
+
+def get_db_conn_with_tag(
+    tag: str,
+) -> Callable[..., AsyncGenerator[DbPoolAndConn, None]]:
+    """Get a dependency that gets a DB connection whose session has the specified tag.
+
+    Usage:
+
+    @router.get("/", response_model=list[Foo])
+    async def read_foos(db: DbPoolAndConn = Depends(get_db_conn_with_tag("nls=en"))):
+        ...
+    """
+
+    async def _get_db_conn_with_tag(
+        pool_and_settings: tuple[AsyncConnectionPool, Settings] = Depends(get_db_pool),
+    ) -> AsyncGenerator[DbPoolAndConn, None]:  # pragma: no cover
+        pool, settings = pool_and_settings
+
+        async with acquire_db_conn(pool, settings, tag=tag) as db:
+            yield db
+
+    return _get_db_conn_with_tag
+
+
+async def gather_db_queries(
+    pool: AsyncConnectionPool,
+    settings: Settings,
+    queries: Iterable[Callable[[DbPoolAndConn], Awaitable[T]]],
+    max_parallel: int | None = None,
+    timeout_secs: float | None = None,
+) -> list[T]:
+    """Run independent queries concurrently, each on its own DB connection.
+
+    Each query is a callable that gets passed a DB connection, the results are
+    returned in the same order as the queries. At most max_parallel queries run at
+    once, and all of them have to finish within timeout_secs, otherwise an
+    asyncio.TimeoutError is raised (timeout_secs defaults to what's left of the
+    deadline for DB calls, if there is one). If a query fails, the others are
+    cancelled, and its exception is raised.
+    Every connection is released back to the pool, no matter what.
+
+    max_parallel defaults to the db_fan_out_max_parallel setting, or else to all of the
+    queries, but by default it's capped at one less than the pool's max size, as the
+    caller might already be holding a connection from the same pool (e.g. via
+    get_db_cursor()), and waiting for the last connection would then never end. Keep
+    an explicit max_parallel below the pool's max size for the same reason.
+
+    Usage:
+
+    @router.get("/summary", response_model=FooSummary)
+    async def read_summary(pool_and_settings=Depends(get_db_pool)):
+        pool, settings = pool_and_settings
+        foos, moos = await gather_db_queries(
+            pool, settings, [list_foos_query, list_moos_query], timeout_secs=5
+        )
+        return FooSummary(foos=foos, moos=moos)
+    """
+    queries = list(queries)
+
+    if not queries:
+        return []
+
+    if max_parallel is None:
+        max_parallel = min(
+            settings.db_fan_out_max_parallel or len(queries), pool.max - 1
+        )
+
+    if timeout_secs is None:
+        timeout_secs = get_db_deadline_remaining_secs()
+
+    semaphore = asyncio.Semaphore(max(max_parallel, 1))
+
+    async def _run_query(query: Callable[[DbPoolAndConn], Awaitable[T]]) -> T:
+        async with semaphore:
+            async with acquire_db_conn(
+                pool, settings, tag=settings.db_session_tag
+            ) as db:
+                return await query(db)
+
+    tasks = [asyncio.ensure_future(_run_query(query)) for query in queries]
+
     try:
-        async with pool.acquire() as conn:  # type: ignore
-            if settings.db_encoding_error_handler_name is not None:
+        done, pending = await asyncio.wait(
+            tasks, timeout=timeout_secs, return_when=asyncio.FIRST_EXCEPTION
+        )
 
-                def output_type_handler(
-                    cursor, name, default_type, size, precision, scale
-                ):
-                    if default_type == DB_TYPE_VARCHAR:
-                        return cursor.var(
-                            default_type,
-                            size,
-                            arraysize=cursor.arraysize,
-                            encoding_errors=settings.db_encoding_error_handler_name,
-                        )
-
-                conn.outputtypehandler = output_type_handler
-
-            if settings.db_call_timeout_secs:
-                conn.call_timeout = settings.db_call_timeout_secs * 1000
-
-            yield DbPoolAndConn(pool=pool, conn=conn)
-    except (DatabaseError, RuntimeError) as ex:
-        if "not connected" in f"{ex}":
-            logger.warning(
-                '"not connected" was raised, either when acquiring or when releasing '
-                "the database connection pool - this can happen on release when the "
-                "pool has already been closed - assuming that that's what happened in "
-                "this case, therefore suppressing this error, so that consuming code "
-                "can continue gracefully"
-            )
-        elif "handler is closed" in f"{ex}":
-            logger.warning(
-                '"handler is closed" was raised, either when acquiring or when '
-                "releasing the database connection pool - this can happen on release "
-                "when the pool has already been closed - assuming that that's what "
-                "happened in this case, therefore suppressing this error, so that "
-                "consuming code can continue gracefully"
+        for task in tasks:
+            if task in done and task.exception() is not None:
+                raise task.exception()  # type: ignore
+
+        if pending:
+            raise asyncio.TimeoutError(
+                f"{len(pending)} of {len(tasks)} database queries did not finish "
+                f"within {timeout_secs} seconds"
             )
-        else:
-            raise ex
+
+        return [task.result() for task in tasks]
+    finally:
+        for task in tasks:
+            task.cancel()
+
+        # Wait for the cancelled queries to finish, so that their connections have
+        # been released by the time that this returns
+        await asyncio.gather(*tasks, return_exceptions=True)
 
 
 async def get_db_cursor(
@@ -208,16 +761,251 @@ async def get_db_cursor(
         yield DbPoolConnAndCursor(pool=pool, conn=conn, cursor=cursor)
 
 
-async def close_db_pools():  # pragma: no cover
+@asynccontextmanager
+async def db_transaction(
+    db: DbPoolAndConn | DbPoolConnAndCursor,
+) -> AsyncIterator[DbPoolAndConn | DbPoolConnAndCursor]:
+    """Run the statements made within this context as one transaction.
+
+    Commits once when the context exits normally, and rolls back if it exits with an
+    error. If nothing is left uncommitted by then, e.g. because the last statement was
+    run with execute_and_commit() (or execute_db_statement() with commit=True), then
+    the commit is skipped, so that a single-statement write costs only one round trip.
+
+    Put this inside a function decorated with handle_db_errors(), so that the rollback
+    happens before the error gets handled.
+
+    Usage:
+
+    @handle_db_errors
+    async def _submit_foo(db: DbPoolConnAndCursor, foo: Foo):
+        async with db_transaction(db):
+            await db.cursor.execute("DELETE FROM foo WHERE id = :id", [foo.id])
+            await execute_and_commit(
+                db.cursor, "INSERT INTO foo VALUES (:1, :2)", [foo.id, foo.name]
+            )
+    """
+    conn = db.conn
+
+    try:
+        yield db
+    except BaseException:
+        try:
+            await conn.rollback()
+        except (DatabaseError, InterfaceError) as ex:
+            logger.warning(
+                "Rolling back the database transaction failed, suppressing this "
+                "error so that the original error gets raised - this can happen when "
+                f"the connection has already been closed, error: {ex}"
+            )
+
+        raise
+
+    if conn.transaction_in_progress:
+        await conn.commit()
+
+
+async def prepare_db_statements(settings: Settings):  # pragma: no cover
+    """Pre-parse all of the registered statements.
+
+    Each connection has its own statement cache, so the statements are parsed on as
+    many connections as the pool opens up front (at least one). This should be called
+    on app startup, after all of the statements have been registered. It also means
+    that any invalid SQL in the registry is found on startup instead of on first use.
+    """
+    if not DB_STATEMENTS:
+        return
+
+    pool = await get_or_create_db_pool(settings)
+
+    async with AsyncExitStack() as stack:
+        for _ in range(max(pool.min, 1)):
+            conn = await stack.enter_async_context(pool.acquire())  # type: ignore
+
+            for statement in DB_STATEMENTS.values():
+                async with conn.cursor() as cursor:
+                    await cursor.parse(statement.sql)
+
+    logger.info(
+        f"Pre-parsed {len(DB_STATEMENTS)} registered statements on "
+        f"{max(pool.min, 1)} database connections"
+    )
+
+
+def _get_db_pool_busy(pool: AsyncConnectionPool) -> int:
+    try:
+        return pool.busy
+    except (DatabaseError, InterfaceError):
+        # The pool has already been closed
+        return 0
+
+
+async def _wait_for_db_pools_to_drain(
+    pools_to_drain: list[AsyncConnectionPool], grace_secs: float
+):
+    deadline = time.monotonic() + grace_secs
+
+    while time.monotonic() < deadline:
+        busy = sum(_get_db_pool_busy(pool) for pool in pools_to_drain)
+
+        if not busy:
+            return
+
+        logger.info(
+            f"Waiting for {busy} busy database connections to be released before "
+            "closing the database connection pools"
+        )
+        await asyncio.sleep(min(DB_POOL_DRAIN_POLL_SECS, deadline - time.monotonic()))
+
+
+async def close_db_pools(
+    grace_secs: float | None = None, force: bool = False
+) -> dict[DbPoolKey, int]:
     """Close the DB connection pools.
 
     This shouldn't need to be called manually in most cases, it's registered as a
     FastAPI shutdown function, so it will get called when the Python process ends.
+
+    The pools are taken out of use straight away, so anything acquiring a connection
+    from here on gets a new pool. If grace_secs is specified, then connections that are
+    still busy get up to that long to be released. Then all of the pools (including
+    retired pools, see recycle_db_pool()) are closed at the same time. Connections
+    that are still busy only get force-closed if force is True (as is the case when
+    shutting down, see shutdown_db_pools()), otherwise closing a pool with busy
+    connections fails (and the failure is suppressed), so that requests that are
+    still using them can finish. Returns the number of busy connections that were
+    force-closed for each pool (only for pools that had any).
     """
-    for pool, _ in pools.DB_POOLS.values():
-        await close_db_pool(pool)
+    tasks = [
+        *pools.DB_POOL_MONITORS.values(),
+        *pools.DB_POOL_AUTOSIZE_TASKS.values(),
+    ]
+
+    for task in tasks:
+        task.cancel()
+
+    pools_to_close = [
+        (pool_key, pool) for pool_key, (pool, _) in pools.DB_POOLS.items()
+    ] + pools.DB_RETIRED_POOLS
 
     pools.DB_POOLS = {}
+    pools.DB_SESSION_TAGS = {}
+    pools.DB_POOL_MONITORS = {}
+    pools.DB_POOL_HEALTH = {}
+    # Pools get closed when packages or types might have changed, e.g. when package
+    # state has been invalidated, so all the type caches are cleared too
+    clear_db_object_types()
+    pools.DB_POOL_AUTOSIZE_TASKS = {}
+    pools.DB_RETIRED_POOLS = []
+
+    # Wait for the cancelled tasks to finish, so that none of them is still holding a
+    # connection (e.g. for a health check) when the pools get closed. Tasks that were
+    # started in another event loop (e.g. by an earlier TestClient) can't be waited on.
+    loop = asyncio.get_running_loop()
+    await asyncio.gather(
+        *(
+            task
+            for task in tasks
+            if task is not asyncio.current_task() and task.get_loop() is loop
+        ),
+        return_exceptions=True,
+    )
+
+    if grace_secs:
+        await _wait_for_db_pools_to_drain(
+            [pool for _, pool in pools_to_close], grace_secs
+        )
+
+    busy_pools = (
+        {pool: busy for _, pool in pools_to_close if (busy := _get_db_pool_busy(pool))}
+        if force
+        else {}
+    )
+    force_closed: dict[DbPoolKey, int] = {}
+
+    for pool_key, pool in pools_to_close:
+        if pool in busy_pools:
+            force_closed[pool_key] = force_closed.get(pool_key, 0) + busy_pools[pool]
+
+    for pool_key, busy in force_closed.items():
+        logger.warning(
+            f"Force-closing {busy} busy database connections of the database "
+            f"connection pool for {pool_key.db_user}@{pool_key.db_host}:"
+            f"{pool_key.db_port}/{pool_key.db_service_name}"
+        )
+
+    await asyncio.gather(
+        *(close_db_pool(pool, force=pool in busy_pools) for _, pool in pools_to_close)
+    )
+
+    return force_closed
+
+
+def start_db_pools():
+    """Let DB connection pools get created again, after shutdown_db_pools().
+
+    Call this at the start of the app's lifespan, so that the app can be started again
+    in the same process after it has been shut down (e.g. by each test module's
+    TestClient), see shutdown_db_pools().
+    """
+    pools.DB_POOLS_SHUTTING_DOWN = False
+
+
+async def shutdown_db_pools(grace_secs: float | None = None) -> dict[DbPoolKey, int]:
+    """Close the DB connection pools for good, when the app is shutting down.
+
+    Unlike close_db_pools(), no new pools get created afterwards (until
+    start_db_pools() gets called): getting a pool raises an IntermittentDatabaseError
+    instead, so that requests arriving during shutdown are turned away rather than
+    starting new DB work. Connections that are still busy once grace_secs is up get
+    force-closed. See close_db_pools() for what gets returned.
+
+    Usage:
+
+    @asynccontextmanager
+    async def lifespan(app: FastAPI):
+        start_db_pools()
+
+        yield
+
+        await shutdown_db_pools(get_settings().db_shutdown_grace_secs)
+    """
+    pools.DB_POOLS_SHUTTING_DOWN = True
+
+    return await close_db_pools(grace_secs=grace_secs, force=True)
+
+
+async def get_db_object_type(
+    db: DbPoolAndConn | DbPoolConnAndCursor, name: str
+) -> DbObjectType:
+    """Get the DB object type with the specified name.
+
+    Types are cached per pool, so only the first lookup of each type costs a round
+    trip. The cache is cleared when handle_db_errors() sees an error indicating that a
+    type has been dropped or changed.
+
+    Usage:
+
+    @handle_db_errors
+    async def _submit_foos(db: DbPoolConnAndCursor, foos: list[Foo]):
+        foo_tab_type = await get_db_object_type(db, "FOO_PKG.FOO_TAB")
+        await db.cursor.callproc(
+            "foo_pkg.submit_foos", [build_db_coll(foo_tab_type, foos)]
+        )
+    """
+    types = pools.DB_OBJECT_TYPES.setdefault(db.pool, {})
+
+    if (db_object_type := types.get(name)) is None:
+        db_object_type = await db.conn.gettype(name)
+        types[name] = db_object_type
+
+    return db_object_type
+
+
+def clear_db_object_types():
+    """Clear the cached DB object types, and how to convert between them and Python."""
+    pools.DB_OBJECT_TYPES = {}
+    clear_db_object_plans()
 
 
 def handle_db_errors(func: Callable[P, Awaitable[T]]) -> Callable[P, Awaitable[T]]:
@@ -255,6 +1043,14 @@ def handle_db_errors(func: Callable[P, Awaitable[T]]) -> Callable[P, Awaitable[T
         except DatabaseError as exc:
             exc_str = f"{exc}".lower()
 
+            if DB_OBJECT_TYPE_INVALIDATED_REGEX.search(exc_str) is not None:
+                logger.warning(
+                    "Database call threw an exception indicating that a database "
+                    "object type has been dropped or changed, will clear the cached "
+                    "database object types"
+                )
+                clear_db_object_types()
+
             for k, v in INTERMITTENT_DATABASE_ERROR_STRING_MAP.items():
                 if (isinstance(v, Pattern) and v.search(exc_str) is not None) or (
                     isinstance(v, str) and v in exc_str
@@ -0,0 +1,217 @@
+import asyncio
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Awaitable, Callable, Iterator
+from weakref import WeakKeyDictionary
+
+from loguru import logger
+from oracledb import AsyncConnection
+
+from fastapi_oracle.config import get_settings
+from fastapi_oracle.errors import DbDeadlineExceededError
+
+
+# Deadline (in time.monotonic() terms) by which all DB calls for the current request
+# have to be done, or None if there's no deadline
+DB_DEADLINE: ContextVar[float | None] = ContextVar("db_deadline", default=None)
+
+# Configured call timeout (in ms, 0 means no timeout) of each acquired DB connection,
+# which the call timeout gets set from before each call, so that a deadline that
+# shortened it once doesn't keep on shortening it for the rest of the checkout
+_DB_CALL_TIMEOUTS_MS: WeakKeyDictionary[AsyncConnection, int] = WeakKeyDictionary()
+
+
+def get_db_deadline_remaining_secs() -> float | None:
+    """Get how many seconds are left until the current DB deadline.
+
+    Returns None if there's no deadline, and a negative number if the deadline has
+    already passed.
+    """
+    deadline = DB_DEADLINE.get()
+
+    if deadline is None:
+        return None
+
+    return deadline - time.monotonic()
+
+
+def _get_new_db_deadline(timeout_secs: float | None) -> float | None:
+    deadline = DB_DEADLINE.get()
+
+    if timeout_secs is not None:
+        new_deadline = time.monotonic() + timeout_secs
+
+        if deadline is None or new_deadline < deadline:
+            deadline = new_deadline
+
+    return deadline
+
+
+@contextmanager
+def db_deadline(timeout_secs: float | None) -> Iterator[float | None]:
+    """Set a deadline for all DB calls made within this context.
+
+    The deadline is never extended, i.e. if there's already an earlier deadline, then
+    that one stays in place. A timeout of None leaves the current deadline as it is.
+    """
+    deadline = _get_new_db_deadline(timeout_secs)
+    token = DB_DEADLINE.set(deadline)
+
+    try:
+        yield deadline
+    finally:
+        DB_DEADLINE.reset(token)
+
+
+def with_db_deadline(
+    timeout_secs: float | None = None,
+) -> Callable[[], Awaitable[float | None]]:
+    """Get a dependency that sets a deadline for all DB calls made by the request.
+
+    Defaults to the db_request_timeout_secs setting. The deadline has to be set before
+    the DB connection is acquired, so declare it on the router (or app), e.g.:
+
+    router = APIRouter(dependencies=[Depends(with_db_deadline(5))])
+    """
+
+    async def _with_db_deadline() -> float | None:
+        # Each request runs in its own context, so the deadline doesn't need to be
+        # reset afterwards
+        deadline = _get_new_db_deadline(
+            timeout_secs
+            if timeout_secs is not None
+            else get_settings().db_request_timeout_secs
+        )
+        DB_DEADLINE.set(deadline)
+        return deadline
+
+    return _with_db_deadline
+
+
+def apply_db_deadline(conn: AsyncConnection, call_timeout_ms: int | None = None):
+    """Set the call timeout of the DB connection from the remaining deadline budget.
+
+    The call timeout becomes whichever is shorter out of the remaining budget and the
+    connection's configured call timeout (where 0 means no timeout). The configured
+    call timeout is the specified one, which gets kept for the connection's later
+    calls, or else the one last specified for the connection (or else its call timeout
+    when it was first seen here). Raises a DbDeadlineExceededError, without making a
+    DB call, if there's no budget left.
+
+    This is called when a connection is acquired, and before each call made by the
+    cursor helpers, so it only needs to be called manually before other DB calls.
+    """
+    if call_timeout_ms is not None:
+        _DB_CALL_TIMEOUTS_MS[conn] = call_timeout_ms
+    else:
+        call_timeout_ms = _DB_CALL_TIMEOUTS_MS.setdefault(conn, conn.call_timeout)
+
+    remaining_secs = get_db_deadline_remaining_secs()
+
+    if remaining_secs is None:
+        conn.call_timeout = call_timeout_ms
+        return
+
+    if remaining_secs <= 0:
+        raise DbDeadlineExceededError(
+            "The deadline for database calls has passed, not making any more calls"
+        )
+
+    remaining_ms = max(int(remaining_secs * 1000), 1)
+    conn.call_timeout = (
+        min(call_timeout_ms, remaining_ms) if call_timeout_ms else remaining_ms
+    )
+
+
+class DbDeadlineMiddleware:
+    """ASGI middleware that sets a deadline for all DB calls made by each request.
+
+    Defaults to the db_request_timeout_secs setting. Also cancels the request (and so
+    whatever DB call it's waiting on) when the client disconnects before the response
+    has been sent, so that it doesn't keep a pooled connection busy for nothing. Work
+    that runs after the response has been sent (background tasks, and the teardown of
+    dependencies with yield) is never cancelled.
+
+    Usage:
+
+    app.add_middleware(DbDeadlineMiddleware, timeout_secs=5)
+    """
+
+    def __init__(
+        self,
+        app: Any,
+        timeout_secs: float | None = None,
+        cancel_on_disconnect: bool = True,
+    ):
+        self.app = app
+        self.timeout_secs = timeout_secs
+        self.cancel_on_disconnect = cancel_on_disconnect
+
+    async def __call__(self, scope: dict, receive: Callable, send: Callable):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timeout_secs = (
+            self.timeout_secs
+            if self.timeout_secs is not None
+            else get_settings().db_request_timeout_secs
+        )
+
+        with db_deadline(timeout_secs):
+            if self.cancel_on_disconnect:
+                await self._call_cancelling_on_disconnect(scope, receive, send)
+            else:
+                await self.app(scope, receive, send)
+
+    async def _call_cancelling_on_disconnect(
+        self, scope: dict, receive: Callable, send: Callable
+    ):
+        # Only one thing may wait on receive() at a time, so the watcher is the only
+        # thing that does, and it passes each message on to the app
+        messages: asyncio.Queue = asyncio.Queue(maxsize=1)
+        response_sent = False
+
+        async def _send(message: dict):
+            nonlocal response_sent
+
+            await send(message)
+
+            if message["type"] == "http.response.body" and not message.get(
+                "more_body", False
+            ):
+                response_sent = True
+
+        app_task = asyncio.create_task(self.app(scope, messages.get, _send))
+
+        async def _watch_for_disconnect():
+            while True:
+                message = await receive()
+
+                # The server also sends a disconnect once the response has been sent,
+                # the app might still be running background tasks or dependency
+                # teardown by then, so it's left to finish
+                if message["type"] == "http.disconnect" and not response_sent:
+                    app_task.cancel()
+                    return
+
+                await messages.put(message)
+
+                if message["type"] == "http.disconnect":
+                    return
+
+        watcher_task = asyncio.create_task(_watch_for_disconnect())
+
+        try:
+            await app_task
+        except asyncio.CancelledError:
+            if not watcher_task.done():
+                raise
+
+            logger.info(
+                "Client disconnected before the response was sent, cancelled the "
+                f"request to {scope.get('path')}"
+            )
+        finally:
+            watcher_task.cancel()
@@ -24,6 +24,10 @@ class CursorRecordCharacterEncodingError(Exception):
     """Character encoding error in cursor record."""
 
 
+class DbDeadlineExceededError(Exception):
+    """Deadline for DB calls exceeded, no time left to make the call."""
+
+
 # This list acts as a registry. Anything that wants more error classes treated as
 # intermittent database errors, adds to this list on app startup. So the entries that
 # are literally defined here, should only be considered the base set of entries, not the
@@ -1,5 +1,47 @@
-from fastapi_oracle.constants import DbPoolAndCreatedTime, DbPoolKey
+import asyncio
+
+from oracledb import AsyncConnectionPool, DbObjectType
+
+from fastapi_oracle.autosize import DbPoolAutosizer
+from fastapi_oracle.constants import (
+    DbPoolAndCreatedTime,
+    DbPoolHealth,
+    DbPoolKey,
+    DbSessionCallback,
+)
 
 
 # Simple singleton to cache DB connection pools for the lifetime of the app object
 DB_POOLS: dict[DbPoolKey, DbPoolAndCreatedTime] = {}
+
+# Set when the app is shutting down, after which no more pools get created
+DB_POOLS_SHUTTING_DOWN = False
+
+# Session callbacks of the DB connection pools, kept separately from the pools so that
+# they outlive the pools being closed and re-created
+DB_SESSION_CALLBACKS: dict[DbPoolKey, DbSessionCallback] = {}
+
+# Tag that each session (keyed by session ID and serial number) in each DB connection
+# pool was last initialized for
+DB_SESSION_TAGS: dict[DbPoolKey, dict[tuple[int, int], str | None]] = {}
+
+# Background health monitor task of each DB connection pool
+DB_POOL_MONITORS: dict[DbPoolKey, asyncio.Task] = {}
+
+# Health of each DB connection pool, as last checked by its monitor
+DB_POOL_HEALTH: dict[DbPoolKey, DbPoolHealth] = {}
+
+# DB object types of each DB connection pool, keyed by type name, so that looking up a
+# type doesn't cost a round trip every time
+DB_OBJECT_TYPES: dict[AsyncConnectionPool, dict[str, DbObjectType]] = {}
+
+# Autosizer of each DB connection pool, kept separately from the pools so that the size
+# that it arrived at outlives the pools being closed and re-created
+DB_POOL_AUTOSIZERS: dict[DbPoolKey, DbPoolAutosizer] = {}
+
+# Background autosize task of each DB connection pool
+DB_POOL_AUTOSIZE_TASKS: dict[DbPoolKey, asyncio.Task] = {}
+
+# DB connection pools that have been replaced by a resized pool, and that get closed
+# once all of their connections have been released
+DB_RETIRED_POOLS: list[tuple[DbPoolKey, AsyncConnectionPool]] = []
@@ -0,0 +1,122 @@
+from collections.abc import Mapping, Sequence
+from typing import Any
+
+from oracledb import AsyncCursor
+
+from fastapi_oracle.config import Settings
+from fastapi_oracle.constants import DEFAULT_STMT_CACHE_SIZE, DbStatement
+from fastapi_oracle.deadlines import apply_db_deadline
+from fastapi_oracle.utils import execute_and_commit
+
+
+# This dict acts as a registry. Anything that wants named statements available, adds to
+# this dict on app startup (preferably via register_db_statement()), before the DB
+# connection pool gets created, so that the statement cache can be sized to fit all of
+# the registered statements. Keyed by statement name.
+DB_STATEMENTS: dict[str, DbStatement] = {}
+
+
+def register_db_statement(
+    name: str,
+    sql: str,
+    bind_types: Mapping[str, Any] | Sequence[Any] | None = None,
+    arraysize: int | None = None,
+    prefetchrows: int | None = None,
+    row_model: type | None = None,
+) -> DbStatement:
+    """Register a named statement, so that it can be executed by name.
+
+    Declaring each statement once means that the exact same SQL text is always sent to
+    the DB, so it keeps on getting found in the client statement cache, instead of
+    getting re-parsed.
+    """
+    if name in DB_STATEMENTS and DB_STATEMENTS[name].sql != sql:
+        raise ValueError(f'Statement "{name}" is already registered with other SQL')
+
+    statement = DbStatement(
+        name=name,
+        sql=sql,
+        bind_types=bind_types,
+        arraysize=arraysize,
+        prefetchrows=prefetchrows,
+        row_model=row_model,
+    )
+    DB_STATEMENTS[name] = statement
+
+    return statement
+
+
+def get_db_statement(name: str) -> DbStatement:
+    """Get the registered statement with the specified name."""
+    try:
+        return DB_STATEMENTS[name]
+    except KeyError:
+        raise KeyError(f'Statement "{name}" is not registered')
+
+
+def get_db_stmt_cache_size(settings: Settings) -> int | None:
+    """Get the statement cache size to use for each DB connection.
+
+    Uses the configured size if there is one, otherwise sizes the cache to fit all of
+    the registered statements plus the default amount of room for ad-hoc statements.
+    Returns None (i.e. use the python-oracledb default) if no statements are
+    registered.
+    """
+    if settings.db_stmt_cache_size is not None:
+        return settings.db_stmt_cache_size
+
+    if not DB_STATEMENTS:
+        return None
+
+    return len(DB_STATEMENTS) + DEFAULT_STMT_CACHE_SIZE
+
+
+async def execute_db_statement(
+    cursor: AsyncCursor,
+    name: str,
+    params: Mapping[str, Any] | Sequence[Any] | None = None,
+    commit: bool = False,
+) -> AsyncCursor:
+    """Execute the registered statement with the specified name.
+
+    Applies the statement's bind types and fetch tuning hints to the cursor before
+    executing, and if the statement has a row model, makes the cursor return its rows
+    as instances of that model (with lowercase column names as the field names). If
+    commit is True, then it commits in the same round trip, see
+    utils.execute_and_commit().
+
+    The cursor's own arraysize and prefetchrows are put back once the statement has
+    been executed (python-oracledb takes the fetch sizes for a statement's fetches when
+    it's executed), so that a cursor shared between statements isn't left with the
+    hints of whichever statement ran last.
+    """
+    statement = get_db_statement(name)
+
+    if statement.bind_types is not None:
+        if isinstance(statement.bind_types, Mapping):
+            cursor.setinputsizes(**statement.bind_types)
+        else:
+            cursor.setinputsizes(*statement.bind_types)
+
+    arraysize, prefetchrows = cursor.arraysize, cursor.prefetchrows
+
+    if statement.arraysize is not None:
+        cursor.arraysize = statement.arraysize
+    if statement.prefetchrows is not None:
+        cursor.prefetchrows = statement.prefetchrows
+
+    try:
+        if commit:
+            await execute_and_commit(cursor, statement.sql, params)
+        else:
+            apply_db_deadline(cursor.connection)
+            await cursor.execute(statement.sql, params)
+    finally:
+        cursor.arraysize, cursor.prefetchrows = arraysize, prefetchrows
+
+    if statement.row_model is not None and cursor.description is not None:
+        row_model = statement.row_model
+        columns = [col[0].lower() for col in cursor.description]
+        cursor.rowfactory = lambda *args: row_model(**dict(zip(columns, args)))
+
+    return cursor
@@ -1,16 +1,31 @@
-from collections.abc import AsyncIterable, Mapping
+import re
+from collections import namedtuple
+from collections.abc import AsyncIterable, Callable, Iterable, Mapping, Sequence
+from functools import partial
+from operator import attrgetter
 from typing import Any, AsyncGenerator, Generator
 
 from loguru import logger
-from oracledb import AsyncCursor, DbObject
+from oracledb import AsyncCursor, DbObject, DbObjectType
 
-from fastapi_oracle.constants import DEFAULT_MAX_ROWS
+from fastapi_oracle.constants import DEFAULT_MAX_ROWS, DbObjectRowType
+from fastapi_oracle.deadlines import apply_db_deadline
 from fastapi_oracle.errors import (
     CursorRecordCharacterEncodingError,
     RecordAttributeCharacterEncodingError,
 )
 
 
+# Cache of how to convert each DB object type into plain Python values, keyed by the
+# type's description (see _get_db_object_type_impl()) and by how to convert it. Each
+# entry holds on to the description, so that its ID can't get reused while cached
+_DB_OBJECT_PLANS: dict[tuple[Any, ...], tuple[Any, Callable[[DbObject], Any]]] = {}
+
+# Cache of how to build each DB object record type from Python values, keyed the same
+# way
+_DB_OBJECT_BUILD_PLANS: dict[int, tuple[Any, Callable[[Any], DbObject]]] = {}
+
+
 def cursor_rows_as_dicts(cursor: AsyncCursor):
     """Make the specified cursor return its rows as dicts instead of tuples.
 
@@ -22,7 +37,33 @@ def cursor_rows_as_dicts(cursor: AsyncCursor):
     cursor.rowfactory = lambda *args: dict(zip(columns, args))
 
 
+async def execute_and_commit(
+    cursor: AsyncCursor,
+    statement: str,
+    parameters: Mapping[str, Any] | Sequence[Any] | None = None,
+) -> AsyncCursor:
+    """Execute the specified statement, and commit in the same round trip.
+
+    This turns on autocommit for just this one call, so that the commit piggybacks on
+    the execute, instead of costing a round trip of its own. Use it for the last (or
+    only) statement of a transaction, see core.db_transaction().
+    """
+    conn = cursor.connection
+    apply_db_deadline(conn)
+    autocommit = conn.autocommit
+    conn.autocommit = True
+
+    try:
+        await cursor.execute(statement, parameters)
+    finally:
+        conn.autocommit = autocommit
+
+    return cursor
+
+
 async def _fetch_cursor_record(cursor: AsyncCursor) -> Any:
+    apply_db_deadline(cursor.connection)
+
     try:
         return await cursor.fetchone()
     except UnicodeDecodeError as ex:
@@ -50,25 +91,240 @@ async def cursor_rows_as_gen(
         i += 1
 
 
-def coll_records_as_dicts(coll: DbObject) -> Generator[dict[str, Any], None, None]:
-    """Make the specified collection of records into simple dicts."""
+def _get_record_attr_values_one_by_one(
+    record: DbObject, attr_names: tuple[str, ...]
+) -> tuple[Any, ...]:
+    values = []
+
+    for attr_name in attr_names:
+        try:
+            values.append(getattr(record, attr_name, None))
+        except UnicodeDecodeError as ex:
+            raise RecordAttributeCharacterEncodingError(
+                "Character encoding error in record attribute, decoding to utf-8 "
+                f"failed, error: {ex}, attribute: {attr_name}, value: {ex.object!r}"
+            )
+
+    return tuple(values)
+
+
+def _get_db_object_type_impl(db_object_type: DbObjectType) -> Any:
+    # DbObjectType objects are unhashable wrappers that get made anew all the time, so
+    # the type's description that they wrap is what identifies the type. There's one
+    # description per type per connection pool, and a new one if the type gets
+    # described again, so same-named types of different DBs don't get mixed up
+    return getattr(db_object_type, "_impl", db_object_type)
+
+
+def _compile_record_plan(
+    record_type: DbObjectType, row_type: DbObjectRowType, nested: bool
+) -> Callable[[DbObject], Any]:
+    type_attrs = record_type.attributes
+    attr_names = tuple(f"{type_attr.name}" for type_attr in type_attrs)
+    nested_plans = tuple(
+        (i, _get_db_object_plan(type_attr.type, row_type))
+        for i, type_attr in enumerate(type_attrs)
+        if nested and isinstance(type_attr.type, DbObjectType)
+    )
+
+    # attrgetter() gets all of the attributes in one go, but it only returns a tuple
+    # when getting more than one attribute
+    get_values: Callable[[DbObject], Sequence[Any]] = (
+        attrgetter(*attr_names)
+        if len(attr_names) > 1
+        else partial(_get_record_attr_values_one_by_one, attr_names=attr_names)
+    )
+    make_row: Callable[[Sequence[Any]], Any]
+
+    if row_type == "dict":
+
+        def make_row(values: Sequence[Any]) -> dict[str, Any]:
+            return dict(zip(attr_names, values))
+
+    elif row_type == "tuple":
+        make_row = tuple
+    else:
+        # Type names can have characters that aren't allowed in Python identifiers
+        # (e.g. "FOO$REC"), rename=True takes care of the same in attribute names
+        make_row = namedtuple(  # type: ignore
+            re.sub(r"\W|^(?=\d)", "_", record_type.name), attr_names, rename=True
+        )._make
+
+    def record_plan(record: DbObject) -> Any:
+        try:
+            values: Sequence[Any] = get_values(record)
+        except (UnicodeDecodeError, AttributeError):
+            # Go through the attributes one at a time, to find out which one it was
+            values = _get_record_attr_values_one_by_one(record, attr_names)
+
+        if nested_plans:
+            values = list(values)
+
+            for i, plan in nested_plans:
+                if values[i] is not None:
+                    values[i] = plan(values[i])
+
+        return make_row(values)
+
+    return record_plan
+
+
+def _compile_coll_plan(
+    coll_type: DbObjectType, row_type: DbObjectRowType
+) -> Callable[[DbObject], list[Any]]:
+    element_type = coll_type.element_type
+
+    if not isinstance(element_type, DbObjectType):
+        return lambda coll: coll.aslist()
+
+    element_plan = _get_db_object_plan(element_type, row_type)
+    return lambda coll: [
+        element_plan(element) if element is not None else None
+        for element in coll.aslist()
+    ]
+
+
+def _get_db_object_plan(
+    db_object_type: DbObjectType,
+    row_type: DbObjectRowType,
+    is_coll: bool | None = None,
+    nested: bool = True,
+) -> Callable[[DbObject], Any]:
+    impl = _get_db_object_type_impl(db_object_type)
+    key = (id(impl), row_type, is_coll, nested)
+    cached = _DB_OBJECT_PLANS.get(key)
+
+    if cached is not None and cached[0] is impl:
+        return cached[1]
+
+    if is_coll is None:
+        is_coll = db_object_type.iscollection
+
+    plan = (
+        _compile_coll_plan(db_object_type, row_type)
+        if is_coll
+        else _compile_record_plan(db_object_type, row_type, nested)
+    )
+    _DB_OBJECT_PLANS[key] = (impl, plan)
+
+    return plan
+
+
+def db_object_as_python(obj: DbObject, row_type: DbObjectRowType = "dict") -> Any:
+    """Make the specified object or collection into plain Python values.
+
+    Records become dicts (or tuples, or named tuples, depending on row_type), and
+    collections become lists, recursing into nested records and collections. How to
+    convert each type is worked out once and then cached, so converting many records
+    of the same type is fast.
+    """
+    return _get_db_object_plan(obj.type, row_type)(obj)
+
+
+def coll_records_as_rows(
+    coll: DbObject, row_type: DbObjectRowType = "tuple"
+) -> Generator[Any, None, None]:
+    """Make the specified collection of records into dicts, tuples, or named tuples."""
+    record_plan = _get_db_object_plan(coll.type.element_type, row_type, is_coll=False)
+
+    for record in coll.aslist():
+        yield record_plan(record)
+
+
+def coll_records_as_dicts(
+    coll: DbObject, nested: bool = False
+) -> Generator[dict[str, Any], None, None]:
+    """Make the specified collection of records into simple dicts.
+
+    Nested records and collections are left as they are, unless nested is True, in
+    which case they get converted too (the same as db_object_as_python() does).
+    """
+    record_plan = _get_db_object_plan(
+        coll.type.element_type, "dict", is_coll=False, nested=nested
+    )
+
     for record in coll.aslist():
-        item: dict[str, Any] = {}
+        yield record_plan(record)
+
+
+def _compile_record_build_plan(
+    record_type: DbObjectType,
+) -> Callable[[Any], DbObject]:
+    attr_plans = tuple(
+        (
+            f"{type_attr.name}",
+            f"{type_attr.name}".lower(),
+            type_attr.type if isinstance(type_attr.type, DbObjectType) else None,
+        )
+        for type_attr in record_type.attributes
+    )
+
+    def record_build_plan(record: Any) -> DbObject:
+        values = record if isinstance(record, Mapping) else vars(record)
+        obj = record_type.newobject()
+
+        for attr_name, key, nested_type in attr_plans:
+            value = values[key] if key in values else values.get(attr_name)
+
+            if nested_type is not None and value is not None:
+                value = _build_db_object(nested_type, value)
+
+            setattr(obj, attr_name, value)
+
+        return obj
+
+    return record_build_plan
+
+
+def _build_db_object(db_object_type: DbObjectType, value: Any) -> DbObject:
+    if isinstance(value, DbObject):
+        return value
+
+    if db_object_type.iscollection:
+        return build_db_coll(db_object_type, value)
+
+    return _get_db_object_build_plan(db_object_type)(value)
+
+
+def _get_db_object_build_plan(record_type: DbObjectType) -> Callable[[Any], DbObject]:
+    impl = _get_db_object_type_impl(record_type)
+    cached = _DB_OBJECT_BUILD_PLANS.get(id(impl))
+
+    if cached is not None and cached[0] is impl:
+        return cached[1]
+
+    plan = _compile_record_build_plan(record_type)
+    _DB_OBJECT_BUILD_PLANS[id(impl)] = (impl, plan)
+
+    return plan
+
+
+def build_db_coll(coll_type: DbObjectType, records: Iterable[Any]) -> DbObject:
+    """Make the specified records into a collection, ready to be bound.
+
+    Records can be dicts or Pydantic models (or any other objects with attributes),
+    whose keys / field names are the lowercase (or exact) names of the record type's
+    attributes, and nested records and collections get built too. How to build each
+    type is worked out once and then cached. If the collection's elements aren't
+    records, then the records are used as the element values as they are.
+    """
+    element_type = coll_type.element_type
 
-        for type_attr in coll.type.element_type.attributes:
-            attr_name = type_attr.name
+    if not isinstance(element_type, DbObjectType):
+        return coll_type.newobject(list(records))
 
-            try:
-                attr_value = getattr(record, type_attr.name, None)
-            except UnicodeDecodeError as ex:
-                raise RecordAttributeCharacterEncodingError(
-                    "Character encoding error in record attribute, decoding to utf-8 "
-                    f"failed, error: {ex}, attribute: {attr_name}, value: {ex.object!r}"
-                )
+    return coll_type.newobject(
+        [
+            _build_db_object(element_type, record) if record is not None else None
+            for record in records
+        ]
+    )
 
-            item[f"{attr_name}"] = attr_value
 
-        yield item
+def clear_db_object_plans():
+    """Clear the cached plans for converting between DB objects and Python values."""
+    _DB_OBJECT_PLANS.clear()
+    _DB_OBJECT_BUILD_PLANS.clear()
 
 
 def row_keys_to_lower(row: Mapping[str, Any]) -> dict[str, Any]:
@@ -77,7 +333,7 @@ def row_keys_to_lower(row: Mapping[str, Any]) -> dict[str, Any]:
 
 
 async def result_keys_to_lower(
-    result: AsyncIterable[Mapping[str, Any]]
+    result: AsyncIterable[Mapping[str, Any]],
 ) -> AsyncGenerator[dict[str, Any], None]:
     """Make the keys lowercase for each row in the specified results."""
     async for row in result:
@@ -0,0 +1,146 @@
+import pytest
+
+from fastapi_oracle.autosize import DbPoolAutosizer, create_db_pool_autosizer
+from fastapi_oracle.config import Settings
+
+
+def run_autosize_windows(autosizer, count, wait_secs, busy, max_size):
+    decisions = []
+
+    for _ in range(count):
+        autosizer.record_acquire(wait_secs, busy, max_size)
+        decisions.append(autosizer.evaluate(busy, max_size))
+
+    return decisions
+
+
+@pytest.mark.pureunit
+def test_db_pool_autosizer_grow():
+    autosizer = DbPoolAutosizer(max_size=4, min_size_limit=1, max_size_limit=7)
+
+    first, second = run_autosize_windows(autosizer, 2, 0.1, 4, 4)
+
+    # Only grown once the pool has been too small for enough windows in a row
+    assert first is None
+    assert second is not None
+    assert second.old_max_size == 4
+    assert second.new_max_size == 6
+    assert "mean acquire wait of 100.0ms was over 50.0ms" in second.reason
+    assert second.window.acquires == 1
+    assert second.window.peak_utilization == 1.0
+    assert autosizer.max_size == 6
+
+    # Never grown past the limit
+    decisions = run_autosize_windows(autosizer, 4, 0.1, 6, 6)
+    assert [x.new_max_size for x in decisions if x is not None] == [7]
+
+    metrics = autosizer.get_metrics()
+    assert metrics.max_size == 7
+    assert metrics.grows == 2
+    assert metrics.shrinks == 0
+    assert metrics.hot_windows == 2
+    assert metrics.last_window.mean_acquire_wait_ms == 100.0
+    assert len(metrics.decisions) == 2
+
+
+@pytest.mark.pureunit
+def test_db_pool_autosizer_shrink():
+    autosizer = DbPoolAutosizer(
+        max_size=10, min_size_limit=3, max_size_limit=10, step=2
+    )
+
+    decisions = run_autosize_windows(autosizer, 6, 0.0, 3, 10)
+
+    # Only shrunk once the pool has been too big for enough windows in a row, keeping
+    # step spare connections above the peak in use
+    assert decisions[:5] == [None] * 5
+    assert decisions[5].new_max_size == 8
+    assert "peak utilization was under 50% for 6 windows" in decisions[5].reason
+
+    decisions = run_autosize_windows(autosizer, 6, 0.0, 3, 8)
+    assert decisions[5].new_max_size == 6
+
+    decisions = run_autosize_windows(autosizer, 6, 0.0, 2, 6)
+    assert decisions[5].new_max_size == 4
+
+    # Idle windows count too, but never shrunk past the limit
+    decisions = [autosizer.evaluate(0, 4) for _ in range(12)]
+    assert [x.new_max_size for x in decisions if x is not None] == [3]
+    assert autosizer.get_metrics().last_window.acquires == 0
+
+
+@pytest.mark.pureunit
+def test_db_pool_autosizer_opening_conns():
+    autosizer = DbPoolAutosizer(max_size=4, min_size_limit=1, max_size_limit=8)
+
+    # E.g. a freshly resized pool opening its connections, which isn't a sign that the
+    # pool is too small
+    for _ in range(4):
+        autosizer.record_acquire(0.1, 1, 4, at_capacity=False)
+        assert autosizer.evaluate(2, 4) is None
+
+    metrics = autosizer.get_metrics()
+    assert metrics.hot_windows == 0
+    assert metrics.last_window.acquires == 1
+    assert metrics.last_window.mean_acquire_wait_ms == 0.0
+
+
+@pytest.mark.pureunit
+def test_db_pool_autosizer_hysteresis():
+    autosizer = DbPoolAutosizer(max_size=4, min_size_limit=1, max_size_limit=8)
+
+    # Windows in between too small and too big start both counts over
+    for busy in [1, 1, 1, 1, 1, 3, 1, 1]:
+        assert autosizer.evaluate(busy, 4) is None
+
+    autosizer.record_acquire(0.1, 4, 4)
+    assert autosizer.evaluate(4, 4) is None
+    assert autosizer.evaluate(1, 4) is None
+
+    metrics = autosizer.get_metrics()
+    assert metrics.hot_windows == 0
+    assert metrics.cool_windows == 1
+    assert metrics.decisions == ()
+
+
+@pytest.mark.pureunit
+def test_create_db_pool_autosizer():
+    autosizer = create_db_pool_autosizer(Settings(), 4)
+
+    assert autosizer.max_size == 4
+    assert autosizer.min_size_limit == 1
+    assert autosizer.max_size_limit == 8
+    assert autosizer.step == 1
+    assert autosizer.acquire_wait_ms == 50.0
+
+    autosizer = create_db_pool_autosizer(
+        Settings(
+            db_pool_min_size=2,
+            db_pool_increment=2,
+            db_pool_autosize_max_size=20,
+            db_pool_autosize_acquire_wait_ms=0,
+        ),
+        4,
+    )
+
+    assert autosizer.min_size_limit == 2
+    assert autosizer.max_size_limit == 20
+    assert autosizer.step == 2
+    assert autosizer.acquire_wait_ms == 0
+
+    # A configured max pool size is the limit, unless there's an autosizing limit
+    autosizer = create_db_pool_autosizer(Settings(db_pool_max_size=4), 2)
+    assert autosizer.max_size_limit == 4
+
+    autosizer = create_db_pool_autosizer(
+        Settings(db_pool_max_size=4, db_pool_autosize_max_size=6), 4
+    )
+    assert autosizer.max_size_limit == 6
+
+    # The limits get widened to take in the initial size
+    autosizer = create_db_pool_autosizer(
+        Settings(db_pool_autosize_min_size=5, db_pool_autosize_max_size=3), 4
+    )
+
+    assert autosizer.min_size_limit == 4
+    assert autosizer.max_size_limit == 4
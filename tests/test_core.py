@@ -1,12 +1,49 @@
+import asyncio
+from contextlib import asynccontextmanager
 from http import HTTPStatus
-from unittest.mock import AsyncMock, patch
+from itertools import chain, repeat
+from unittest.mock import AsyncMock, MagicMock, patch
 
 import pytest
+from fastapi import FastAPI
 from fastapi.testclient import TestClient
-from oracledb import DatabaseError
+from oracledb import DatabaseError, InterfaceError
 
-from fastapi_oracle.core import handle_db_errors
+from fastapi_oracle import pools, utils
+from fastapi_oracle.autosize import DbPoolAutosizer
+from fastapi_oracle.config import Settings
+from fastapi_oracle.constants import (
+    DbPoolAndConn,
+    DbPoolAndCreatedTime,
+    DbPoolAutosizeDecision,
+    DbPoolHealth,
+    DbPoolKey,
+)
+from fastapi_oracle.core import (
+    _autosize_db_pool,
+    acquire_db_conn,
+    check_db_pool_health,
+    check_db_pool_ready,
+    close_db_pools,
+    close_retired_db_pools,
+    db_transaction,
+    gather_db_queries,
+    get_db_conn_with_tag,
+    get_db_object_type,
+    get_db_pool_autosize_metrics,
+    get_db_pool_health,
+    get_db_pool_key,
+    get_or_create_db_pool,
+    handle_db_errors,
+    init_db_session,
+    recycle_db_pool,
+    shutdown_db_pools,
+    start_db_pool_autosizer,
+    start_db_pools,
+)
+from fastapi_oracle.deadlines import db_deadline
 from fastapi_oracle.errors import (
+    DbDeadlineExceededError,
     IntermittentDatabaseError,
     PackageStateInvalidatedError,
     ProgramUnitNotFoundError,
@@ -65,6 +102,45 @@ async def test_handle_db_errors_package_state_invalidated_raised(mock_close_db_p
     assert "intermittent database error occurred" in str(exc_info.value)
 
 
+@pytest.mark.pureunit
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    ["exc"],
+    [
+        (PackageStateInvalidatedError("ouch"),),
+        (
+            DatabaseError(
+                'ORA-04061: existing state of package body "FOO_PKG" has been '
+                "invalidated"
+            ),
+        ),
+    ],
+)
+@patch("fastapi_oracle.core.close_db_pool")
+async def test_handle_db_errors_package_state_invalidated_clears_types(
+    mock_close_db_pool, exc
+):
+    @handle_db_errors
+    async def _get_foo():
+        raise exc
+
+    foo_rec_type = MagicMock()
+
+    with patch("fastapi_oracle.pools.DB_POOLS", {}), patch(
+        "fastapi_oracle.pools.DB_OBJECT_TYPES", {MagicMock(): {"FOO_PKG.FOO_REC": 1}}
+    ), patch.dict(
+        "fastapi_oracle.utils._DB_OBJECT_PLANS", {(1, "dict"): (foo_rec_type, None)}
+    ), patch.dict(
+        "fastapi_oracle.utils._DB_OBJECT_BUILD_PLANS", {1: (foo_rec_type, None)}
+    ):
+        with pytest.raises(IntermittentDatabaseError):
+            await _get_foo()
+
+        assert pools.DB_OBJECT_TYPES == {}
+        assert utils._DB_OBJECT_PLANS == {}
+        assert utils._DB_OBJECT_BUILD_PLANS == {}
+
+
 @handle_db_errors
 async def handle_db_errors_unknown_db_error_test_func():
     raise DatabaseError("footastic")
@@ -111,6 +187,862 @@ async def test_do_db_call_close_pool_and_fail(mock_close_db_pools, error_msg):
     assert "intermittent database error occurred" in str(exc_info.value)
 
 
+@pytest.mark.pureunit
+@pytest.mark.asyncio
+async def test_init_db_session():
+    settings = Settings()
+    pool_key = get_db_pool_key(settings)
+    pool = MagicMock()
+    pool.max = 1
+    conn1 = MagicMock()
+    conn1.session_id, conn1.serial_num = 1, 11
+    conn2 = MagicMock()
+    conn2.session_id, conn2.serial_num = 2, 22
+    session_callback = AsyncMock()
+
+    with patch.dict(
+        "fastapi_oracle.pools.DB_SESSION_CALLBACKS", {pool_key: session_callback}
+    ), patch.dict("fastapi_oracle.pools.DB_SESSION_TAGS", {}, clear=True):
+        await init_db_session(pool, conn1, settings)
+        await init_db_session(pool, conn1, settings)
+        session_callback.assert_awaited_once_with(conn1, None)
+
+        await init_db_session(pool, conn1, settings, tag="nls=en")
+        await init_db_session(pool, conn2, settings, tag="nls=en")
+        await init_db_session(pool, conn1, settings, tag="nls=en")
+        assert session_callback.await_count == 3
+
+        # Sessions that the pool no longer holds are forgotten eventually
+        conn3 = MagicMock()
+        conn3.session_id, conn3.serial_num = 3, 33
+        await init_db_session(pool, conn3, settings, tag="nls=en")
+        await init_db_session(pool, conn1, settings, tag="nls=en")
+        assert session_callback.await_count == 5
+
+
+@pytest.mark.pureunit
+@pytest.mark.asyncio
+async def test_init_db_session_without_session_callback():
+    conn = MagicMock()
+
+    with patch.dict("fastapi_oracle.pools.DB_SESSION_CALLBACKS", {}, clear=True):
+        await init_db_session(MagicMock(), conn, Settings(), tag="nls=en")
+
+
+@pytest.mark.pureunit
+@pytest.mark.asyncio
+async def test_get_db_object_type():
+    pool = MagicMock()
+    conn = AsyncMock()
+    conn.gettype.return_value = "FOO_TAB type"
+    db = MagicMock(pool=pool, conn=conn)
+
+    with patch("fastapi_oracle.pools.DB_OBJECT_TYPES", {}):
+        assert await get_db_object_type(db, "FOO_PKG.FOO_TAB") == "FOO_TAB type"
+        assert await get_db_object_type(db, "FOO_PKG.FOO_TAB") == "FOO_TAB type"
+        conn.gettype.assert_awaited_once_with("FOO_PKG.FOO_TAB")
+
+
+@handle_db_errors
+async def handle_db_errors_type_invalidated_test_func():
+    raise DatabaseError('ORA-22303: type "FOO"."FOO_TAB" not found')
+
+
+@pytest.mark.pureunit
+@pytest.mark.asyncio
+async def test_handle_db_errors_type_invalidated():
+    pool = MagicMock()
+
+    with patch(
+        "fastapi_oracle.pools.DB_OBJECT_TYPES", {pool: {"FOO_TAB": "FOO_TAB type"}}
+    ), patch("fastapi_oracle.core.clear_db_object_plans") as mock_clear_plans:
+        with pytest.raises(DatabaseError) as exc_info:
+            await handle_db_errors_type_invalidated_test_func()
+
+        assert pools.DB_OBJECT_TYPES == {}
+        mock_clear_plans.assert_called_once()
+
+    assert "ORA-22303" in str(exc_info.value)
+
+
+def db_transaction_test_db(transaction_in_progress=True):
+    conn = MagicMock()
+    conn.transaction_in_progress = transaction_in_progress
+    conn.commit = AsyncMock()
+    conn.rollback = AsyncMock()
+    return MagicMock(conn=conn)
+
+
+@pytest.mark.pureunit
+@pytest.mark.asyncio
+async def test_db_transaction():
+    db = db_transaction_test_db()
+
+    async with db_transaction(db) as db_in_transaction:
+        assert db_in_transaction is db
+
+    db.conn.commit.assert_awaited_once()
+    db.conn.rollback.assert_not_called()
+
+
+@pytest.mark.pureunit
+@pytest.mark.asyncio
+async def test_db_transaction_already_committed():
+    db = db_transaction_test_db(transaction_in_progress=False)
+
+    async with db_transaction(db):
+        pass
+
+    db.conn.commit.assert_not_called()
+
+
+@pytest.mark.pureunit
+@pytest.mark.asyncio
+async def test_db_transaction_failed():
+    db = db_transaction_test_db()
+
+    with pytest.raises(DatabaseError) as exc_info:
+        async with db_transaction(db):
+            raise DatabaseError("footastic")
+
+    assert "footastic" in str(exc_info.value)
+    db.conn.rollback.assert_awaited_once()
+    db.conn.commit.assert_not_called()
+
+
+@pytest.mark.pureunit
+@pytest.mark.asyncio
+async def test_db_transaction_failed_and_rollback_failed():
+    db = db_transaction_test_db()
+    db.conn.rollback.side_effect = DatabaseError("not connected")
+
+    with pytest.raises(DatabaseError) as exc_info:
+        async with db_transaction(db):
+            raise DatabaseError("footastic")
+
+    assert "footastic" in str(exc_info.value)
+
+
+def close_db_pools_test_pools(*busy_counts):
+    db_pools = {}
+
+    for i, busy_count in enumerate(busy_counts):
+        pool = MagicMock()
+        busy = chain(busy_count, repeat(busy_count[-1]))
+        type(pool).busy = property(lambda _, busy=busy: next(busy))
+        pool_key = DbPoolKey("foohost", 1521, f"foouser{i}", "fooservice")
+        db_pools[pool_key] = DbPoolAndCreatedTime(pool=pool, created_time=1.0)
+
+    return db_pools
+
+
+@pytest.mark.pureunit
+@pytest.mark.asyncio
+@patch("fastapi_oracle.core.close_db_pool")
+async def test_close_db_pools(mock_close_db_pool):
+    db_pools = close_db_pools_test_pools([0], [3])
+    pool_keys = list(db_pools.keys())
+    retired_pool = MagicMock()
+    type(retired_pool).busy = property(lambda _: 2)
+    events = []
+
+    async def background_task(name):
+        try:
+            await asyncio.sleep(3600)
+        finally:
+            # E.g. a health check giving its connections back
+            await asyncio.sleep(0)
+            events.append(f"{name} stopped")
+
+    monitor = asyncio.create_task(background_task("monitor"))
+    autosize_task = asyncio.create_task(background_task("autosizer"))
+    await asyncio.sleep(0)
+    mock_close_db_pool.side_effect = lambda pool, force: events.append("pool closed")
+
+    with patch("fastapi_oracle.pools.DB_POOLS", db_pools), patch(
+        "fastapi_oracle.pools.DB_POOL_MONITORS", {"foo": monitor}
+    ), patch(
+        "fastapi_oracle.pools.DB_POOL_AUTOSIZE_TASKS", {"foo": autosize_task}
+    ), patch(
+        "fastapi_oracle.pools.DB_RETIRED_POOLS", [(pool_keys[1], retired_pool)]
+    ):
+        force_closed = await close_db_pools(force=True)
+
+        assert pools.DB_POOLS == {}
+        assert pools.DB_POOL_MONITORS == {}
+        assert pools.DB_POOL_AUTOSIZE_TASKS == {}
+        assert pools.DB_RETIRED_POOLS == []
+
+    assert force_closed == {pool_keys[1]: 5}
+    # The background tasks have finished before any of the pools get closed
+    assert monitor.cancelled()
+    assert autosize_task.cancelled()
+    assert events[:2] == ["monitor stopped", "autosizer stopped"]
+    assert events[2:] == ["pool closed"] * 3
+    mock_close_db_pool.assert_any_await(db_pools[pool_keys[0]].pool, force=False)
+    mock_close_db_pool.assert_any_await(db_pools[pool_keys[1]].pool, force=True)
+    mock_close_db_pool.assert_any_await(retired_pool, force=True)
+
+
+@pytest.mark.pureunit
+@pytest.mark.asyncio
+@patch("fastapi_oracle.core.close_db_pool")
+async def test_close_db_pools_not_forced(mock_close_db_pool):
+    db_pools = close_db_pools_test_pools([0], [3])
+
+    with patch("fastapi_oracle.pools.DB_POOLS", db_pools):
+        force_closed = await close_db_pools()
+
+    # Busy connections are left for the requests that are still using them
+    assert force_closed == {}
+
+    for pool, _ in db_pools.values():
+        mock_close_db_pool.assert_any_await(pool, force=False)
+
+
+@pytest.mark.pureunit
+@pytest.mark.asyncio
+@patch("fastapi_oracle.core.DB_POOL_DRAIN_POLL_SECS", 0.01)
+@patch("fastapi_oracle.core.close_db_pool")
+async def test_close_db_pools_drained_within_grace_period(mock_close_db_pool):
+    db_pools = close_db_pools_test_pools([2, 1, 0], [1, 0])
+
+    with patch("fastapi_oracle.pools.DB_POOLS", db_pools):
+        force_closed = await close_db_pools(grace_secs=1)
+
+    assert force_closed == {}
+    assert mock_close_db_pool.await_count == 2
+
+
+def raise_pool_not_open(pool):
+    raise InterfaceError("DPY-1002: connection pool is not open")
+
+
+@pytest.mark.pureunit
+@pytest.mark.asyncio
+@patch("fastapi_oracle.core.DB_POOL_DRAIN_POLL_SECS", 0.01)
+@patch("fastapi_oracle.core.close_db_pool")
+async def test_shutdown_db_pools_not_drained_within_grace_period(
+    mock_close_db_pool,
+):
+    pool = MagicMock()
+    type(pool).busy = property(lambda _: 2)
+    closed_pool = MagicMock()
+    type(closed_pool).busy = property(raise_pool_not_open)
+    pool_key = DbPoolKey("foohost", 1521, "foouser", "fooservice")
+    closed_pool_key = DbPoolKey("moohost", 1521, "moouser", "mooservice")
+    db_pools = {
+        pool_key: DbPoolAndCreatedTime(pool=pool, created_time=1.0),
+        closed_pool_key: DbPoolAndCreatedTime(pool=closed_pool, created_time=1.0),
+    }
+
+    with patch("fastapi_oracle.pools.DB_POOLS", db_pools), patch(
+        "fastapi_oracle.pools.DB_POOLS_SHUTTING_DOWN", False
+    ):
+        force_closed = await shutdown_db_pools(grace_secs=0.05)
+
+        assert pools.DB_POOLS_SHUTTING_DOWN
+
+        with pytest.raises(IntermittentDatabaseError) as exc_info:
+            await get_or_create_db_pool(Settings())
+
+    assert "pools are shutting down" in str(exc_info.value)
+    assert force_closed == {pool_key: 2}
+    mock_close_db_pool.assert_any_await(pool, force=True)
+    mock_close_db_pool.assert_any_await(closed_pool, force=False)
+
+
+@pytest.mark.pureunit
+@patch("fastapi_oracle.core.close_db_pool")
+def test_start_db_pools_after_shutdown(mock_close_db_pool):
+    @asynccontextmanager
+    async def lifespan(app: FastAPI):
+        start_db_pools()
+
+        yield
+
+        await shutdown_db_pools()
+
+    app = FastAPI(lifespan=lifespan)
+
+    with patch("fastapi_oracle.pools.DB_POOLS_SHUTTING_DOWN", False):
+        # E.g. a module-scoped TestClient in each of two test modules
+        with TestClient(app):
+            assert not pools.DB_POOLS_SHUTTING_DOWN
+
+        assert pools.DB_POOLS_SHUTTING_DOWN
+
+        with TestClient(app):
+            assert not pools.DB_POOLS_SHUTTING_DOWN
+
+
+@pytest.mark.pureunit
+@pytest.mark.asyncio
+@patch("fastapi_oracle.core.close_db_pool")
+async def test_close_retired_db_pools(mock_close_db_pool):
+    db_pools = close_db_pools_test_pools([1, 0], [0])
+    retired_pools = [(pool_key, pool) for pool_key, (pool, _) in db_pools.items()]
+
+    with patch("fastapi_oracle.pools.DB_RETIRED_POOLS", retired_pools):
+        await close_retired_db_pools()
+
+        assert pools.DB_RETIRED_POOLS == retired_pools[:1]
+        mock_close_db_pool.assert_awaited_once_with(retired_pools[1][1])
+
+        await close_retired_db_pools()
+
+        assert pools.DB_RETIRED_POOLS == []
+        mock_close_db_pool.assert_awaited_with(retired_pools[0][1])
+
+        mock_close_db_pool.reset_mock()
+        await close_retired_db_pools()
+
+    mock_close_db_pool.assert_not_called()
+
+
+@pytest.mark.pureunit
+@patch("fastapi_oracle.core._create_db_pool")
+def test_recycle_db_pool(mock_create_db_pool):
+    settings = Settings()
+    pool_key = get_db_pool_key(settings)
+    old_pool, new_pool, newer_pool = MagicMock(), MagicMock(), MagicMock()
+    mock_create_db_pool.side_effect = [new_pool, newer_pool]
+
+    with patch.dict("fastapi_oracle.pools.DB_POOLS", {}, clear=True), patch(
+        "fastapi_oracle.pools.DB_RETIRED_POOLS", []
+    ), patch.dict("fastapi_oracle.pools.DB_OBJECT_TYPES", {old_pool: {}}, clear=True):
+        recycle_db_pool(pool_key, settings, 6)
+
+        # Nothing to retire if there's no pool yet
+        assert pools.DB_POOLS[pool_key].pool is new_pool
+        assert pools.DB_RETIRED_POOLS == []
+
+        pools.DB_POOLS[pool_key] = DbPoolAndCreatedTime(pool=old_pool, created_time=1.0)
+        recycle_db_pool(pool_key, settings, 9)
+
+        assert pools.DB_POOLS[pool_key].pool is newer_pool
+        assert pools.DB_RETIRED_POOLS == [(pool_key, old_pool)]
+        assert pools.DB_OBJECT_TYPES == {}
+
+    mock_create_db_pool.assert_called_with(settings, max_size=9)
+
+
+@pytest.mark.pureunit
+@pytest.mark.asyncio
+@patch("fastapi_oracle.core.recycle_db_pool")
+@patch("fastapi_oracle.core.close_retired_db_pools")
+async def test_autosize_db_pool(mock_close_retired_db_pools, mock_recycle_db_pool):
+    settings = Settings(db_pool_autosize_interval_secs=0.001)
+    pool_key = get_db_pool_key(settings)
+    pool = MagicMock(busy=4, max=4)
+    autosizer = MagicMock()
+    decision = DbPoolAutosizeDecision(
+        decided_time=1.0,
+        old_max_size=4,
+        new_max_size=6,
+        reason="pool was too small",
+        window=None,
+    )
+    autosizer.evaluate.side_effect = chain(
+        [None, decision, RuntimeError("footastic")], repeat(None)
+    )
+
+    async def close_retired_db_pools():
+        # The pool gets created after the autosizer's first window
+        if mock_close_retired_db_pools.await_count > 1:
+            pools.DB_POOLS[pool_key] = DbPoolAndCreatedTime(pool=pool, created_time=1.0)
+
+    mock_close_retired_db_pools.side_effect = close_retired_db_pools
+
+    with patch.dict("fastapi_oracle.pools.DB_POOLS", {}, clear=True), patch.dict(
+        "fastapi_oracle.pools.DB_POOL_AUTOSIZERS", {pool_key: autosizer}, clear=True
+    ):
+        task = asyncio.create_task(_autosize_db_pool(pool_key, settings))
+
+        while autosizer.evaluate.call_count < 4:
+            await asyncio.sleep(0.001)
+
+        task.cancel()
+
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    # Failures (e.g. the RuntimeError) are logged, and autosizing keeps on going
+    autosizer.evaluate.assert_called_with(4, 4)
+    mock_recycle_db_pool.assert_called_once_with(pool_key, settings, 6)
+
+
+@pytest.mark.pureunit
+@pytest.mark.asyncio
+@patch("fastapi_oracle.core._autosize_db_pool")
+async def test_start_db_pool_autosizer(mock_autosize_db_pool):
+    settings = Settings()
+    pool_key = get_db_pool_key(settings)
+
+    with patch.dict(
+        "fastapi_oracle.pools.DB_POOL_AUTOSIZERS", {}, clear=True
+    ), patch.dict("fastapi_oracle.pools.DB_POOL_AUTOSIZE_TASKS", {}, clear=True):
+        start_db_pool_autosizer(pool_key, settings, 4)
+        autosizer = pools.DB_POOL_AUTOSIZERS[pool_key]
+        task = pools.DB_POOL_AUTOSIZE_TASKS[pool_key]
+
+        # No-op while it's running
+        start_db_pool_autosizer(pool_key, settings, 8)
+        assert pools.DB_POOL_AUTOSIZE_TASKS[pool_key] is task
+
+        await task
+
+        # Restarted once it has stopped, keeping the size that it arrived at
+        start_db_pool_autosizer(pool_key, settings, 8)
+        assert pools.DB_POOL_AUTOSIZE_TASKS[pool_key] is not task
+        assert pools.DB_POOL_AUTOSIZERS[pool_key] is autosizer
+        assert autosizer.max_size == 4
+
+        await pools.DB_POOL_AUTOSIZE_TASKS[pool_key]
+
+    assert mock_autosize_db_pool.await_count == 2
+
+
+@pytest.mark.pureunit
+@pytest.mark.asyncio
+async def test_get_db_pool_autosize_metrics():
+    settings = Settings()
+    autosizer = DbPoolAutosizer(max_size=4, min_size_limit=1, max_size_limit=8)
+
+    with patch.dict("fastapi_oracle.pools.DB_POOL_AUTOSIZERS", {}, clear=True):
+        assert await get_db_pool_autosize_metrics(settings) is None
+
+    with patch.dict(
+        "fastapi_oracle.pools.DB_POOL_AUTOSIZERS",
+        {get_db_pool_key(settings): autosizer},
+    ):
+        metrics = await get_db_pool_autosize_metrics(settings)
+
+    assert metrics is not None
+    assert metrics.max_size == 4
+    assert metrics.decisions == ()
+
+
+class FakeDbPool:
+    def __init__(self, conns, max_size=4):
+        self.idle = list(conns)
+        self.busy = 0
+        self.max = max_size
+        self.acquire = AsyncMock(side_effect=self._acquire)
+
+        for conn in conns:
+            conn.close = AsyncMock(side_effect=lambda conn=conn: self._release(conn))
+
+    async def _acquire(self, tag=None):
+        if not self.idle:
+            await asyncio.sleep(3600)
+
+        self.busy += 1
+        return self.idle.pop()
+
+    def _release(self, conn):
+        self.busy -= 1
+        self.idle.append(conn)
+
+
+@pytest.mark.pureunit
+@pytest.mark.asyncio
+async def test_get_db_conn_with_tag():
+    settings = Settings()
+    conn = MagicMock()
+    conn.session_id, conn.serial_num = 1, 11
+    pool = FakeDbPool([conn])
+    session_callback = AsyncMock()
+    dependency = get_db_conn_with_tag("nls=en")
+
+    with patch.dict(
+        "fastapi_oracle.pools.DB_SESSION_CALLBACKS",
+        {get_db_pool_key(settings): session_callback},
+    ), patch.dict("fastapi_oracle.pools.DB_SESSION_TAGS", {}, clear=True):
+        db_gen = dependency((pool, settings))
+        db = await anext(db_gen)
+
+        assert db == DbPoolAndConn(pool=pool, conn=conn)
+        assert pool.busy == 1
+
+        await db_gen.aclose()
+
+    # The tag is passed on to the pool (which uses it in Thick mode), and the session
+    # gets initialized for it
+    pool.acquire.assert_called_once_with(tag="nls=en")
+    session_callback.assert_awaited_once_with(conn, "nls=en")
+    assert pool.busy == 0
+
+
+@pytest.mark.pureunit
+@pytest.mark.asyncio
+async def test_acquire_db_conn_deadline_exceeded():
+    pool = FakeDbPool([])
+
+    with db_deadline(0.2):
+        with pytest.raises(DbDeadlineExceededError) as exc_info:
+            async with acquire_db_conn(pool, Settings()):
+                pass  # pragma: no cover
+
+        assert "passed while waiting for a connection" in str(exc_info.value)
+
+        await asyncio.sleep(0.01)
+
+        with pytest.raises(DbDeadlineExceededError) as exc_info:
+            async with acquire_db_conn(pool, Settings()):
+                pass  # pragma: no cover
+
+        assert "not acquiring a connection" in str(exc_info.value)
+
+    assert pool.acquire.await_count == 1
+    assert pool.busy == 0
+
+
+@pytest.mark.pureunit
+@pytest.mark.asyncio
+async def test_acquire_db_conn_from_retired_pool():
+    settings = Settings()
+    pool_key = get_db_pool_key(settings)
+    conn = MagicMock()
+    retired_pool, pool = FakeDbPool([]), FakeDbPool([conn])
+
+    with patch.dict(
+        "fastapi_oracle.pools.DB_POOLS",
+        {pool_key: DbPoolAndCreatedTime(pool=pool, created_time=1.0)},
+        clear=True,
+    ), patch("fastapi_oracle.pools.DB_RETIRED_POOLS", [(pool_key, retired_pool)]):
+        # E.g. the caller got hold of the pool before the autosizer resized it
+        async with acquire_db_conn(retired_pool, settings) as db:
+            assert db == DbPoolAndConn(pool=pool, conn=conn)
+            assert pool.busy == 1
+
+    retired_pool.acquire.assert_not_called()
+    assert pool.busy == 0
+
+
+class FakeHealthCheckPool:
+    def __init__(self, conns, busy=0, opened=None):
+        self.idle = list(conns)
+        self.busy = busy
+        self.opened = busy + len(conns) if opened is None else opened
+        self.release = AsyncMock(side_effect=self._release)
+        self.drop = AsyncMock(side_effect=self._release)
+
+    async def acquire(self):
+        if not self.idle:
+            await asyncio.sleep(3600)
+
+        self.busy += 1
+        return self.idle.pop()
+
+    async def _release(self, conn):
+        self.busy -= 1
+
+
+@pytest.mark.pureunit
+@pytest.mark.asyncio
+async def test_check_db_pool_health():
+    conns = [AsyncMock(), AsyncMock()]
+    pool = FakeHealthCheckPool(conns, busy=1)
+
+    health = await check_db_pool_health(pool, 1)
+
+    assert health is not None
+    assert health.healthy
+
+    for conn in conns:
+        conn.ping.assert_awaited_once()
+        pool.release.assert_any_await(conn)
+
+    assert pool.busy == 1
+
+
+@pytest.mark.pureunit
+@pytest.mark.asyncio
+async def test_check_db_pool_health_all_conns_busy():
+    pool = FakeHealthCheckPool([], busy=2)
+
+    assert await check_db_pool_health(pool, 1) is None
+
+
+@pytest.mark.pureunit
+@pytest.mark.asyncio
+@patch("fastapi_oracle.core.DB_POOL_HEALTH_CHECK_ACQUIRE_SECS", 0.01)
+async def test_check_db_pool_health_last_idle_conn_taken():
+    # A request takes the last idle connection before the check gets to it
+    pool = FakeHealthCheckPool([], busy=1, opened=2)
+
+    assert await check_db_pool_health(pool, 1) is None
+
+
+@pytest.mark.pureunit
+@pytest.mark.asyncio
+async def test_check_db_pool_health_acquire_timed_out():
+    pool = FakeHealthCheckPool([], opened=0)
+
+    health = await check_db_pool_health(pool, 0.01)
+
+    assert health is not None
+    assert not health.healthy
+    assert health.error == "timeout"
+
+
+@pytest.mark.pureunit
+@pytest.mark.asyncio
+async def test_check_db_pool_health_ping_failed():
+    conn = AsyncMock()
+    failed_conn = AsyncMock()
+    failed_conn.ping.side_effect = DatabaseError("foo not connected moo")
+    pool = FakeHealthCheckPool([conn, failed_conn])
+
+    health = await check_db_pool_health(pool, 1)
+
+    assert health is not None
+    assert not health.healthy
+    assert health.error == "foo not connected moo"
+    pool.drop.assert_awaited_once_with(failed_conn)
+    pool.release.assert_awaited_once_with(conn)
+
+
+@pytest.mark.pureunit
+@pytest.mark.asyncio
+async def test_check_db_pool_health_cancelled():
+    async def ping():
+        await asyncio.sleep(3600)
+
+    conns = [AsyncMock(), AsyncMock()]
+    conns[0].ping.side_effect = ping
+    pool = FakeHealthCheckPool(conns)
+
+    task = asyncio.create_task(check_db_pool_health(pool, 3600))
+    await asyncio.sleep(0.01)
+    task.cancel()
+
+    with pytest.raises(asyncio.CancelledError):
+        await task
+
+    # The connections being pinged when the check got cancelled are given back
+    assert pool.busy == 0
+    assert pool.release.await_count == 2
+
+
+@pytest.mark.pureunit
+@pytest.mark.asyncio
+async def test_check_db_pool_health_drop_failed():
+    conn = AsyncMock()
+    failed_conn = AsyncMock()
+    failed_conn.ping.side_effect = DatabaseError("foo not connected moo")
+    pool = FakeHealthCheckPool([conn, failed_conn])
+    pool.drop.side_effect = InterfaceError("foo already closed moo")
+
+    health = await check_db_pool_health(pool, 1)
+
+    # The other connection still goes back, even though the dead one couldn't be
+    # dropped
+    assert health is not None
+    assert not health.healthy
+    pool.release.assert_awaited_once_with(conn)
+
+
+@pytest.mark.pureunit
+@pytest.mark.asyncio
+async def test_check_db_pool_health_acquire_failed():
+    conn = AsyncMock()
+    pool = FakeHealthCheckPool([conn], opened=0)
+    pool.acquire = AsyncMock(side_effect=[conn, DatabaseError("foo no listener moo")])
+
+    health = await check_db_pool_health(pool, 1)
+
+    assert health is not None
+    assert not health.healthy
+    assert health.error == "foo no listener moo"
+    pool.release.assert_awaited_once_with(conn)
+    conn.ping.assert_not_called()
+
+
+@pytest.mark.pureunit
+@pytest.mark.asyncio
+async def test_get_db_pool_health_and_check_db_pool_ready():
+    settings = Settings()
+    pool_key = get_db_pool_key(settings)
+    healthy = DbPoolHealth(healthy=True, checked_time=1.0)
+    unhealthy = DbPoolHealth(healthy=False, checked_time=2.0, error="no listener")
+
+    with patch.dict("fastapi_oracle.pools.DB_POOL_HEALTH", {}, clear=True):
+        assert await get_db_pool_health(settings) is None
+        assert await check_db_pool_ready(None) is None
+
+    with patch.dict("fastapi_oracle.pools.DB_POOL_HEALTH", {pool_key: healthy}):
+        assert await get_db_pool_health(settings) == healthy
+        assert await check_db_pool_ready(healthy) == healthy
+
+    with pytest.raises(IntermittentDatabaseError) as exc_info:
+        await check_db_pool_ready(unhealthy)
+
+    assert "pool is unhealthy: no listener" in str(exc_info.value)
+
+
+class FakeAcquireDbConn:
+    def __init__(self):
+        self.acquired = 0
+        self.released = 0
+        self.max_concurrent = 0
+
+    @asynccontextmanager
+    async def __call__(self, pool, settings, tag=None):
+        self.acquired += 1
+        self.max_concurrent = max(self.max_concurrent, self.acquired - self.released)
+
+        try:
+            yield MagicMock()
+        finally:
+            self.released += 1
+
+
+def gather_db_queries_test_pool(max_size=4):
+    pool = MagicMock()
+    pool.max = max_size
+    return pool
+
+
+def gather_db_queries_test_query(ret, delay=0.0, exc=None):
+    async def query(db):
+        await asyncio.sleep(delay)
+
+        if exc is not None:
+            raise exc
+
+        return ret
+
+    return query
+
+
+@pytest.mark.pureunit
+@pytest.mark.asyncio
+async def test_gather_db_queries():
+    fake_acquire_db_conn = FakeAcquireDbConn()
+    queries = [
+        gather_db_queries_test_query(42, delay=0.02),
+        gather_db_queries_test_query(43),
+        gather_db_queries_test_query(44, delay=0.01),
+    ]
+
+    with patch("fastapi_oracle.core.acquire_db_conn", fake_acquire_db_conn):
+        ret = await gather_db_queries(
+            gather_db_queries_test_pool(), Settings(), queries, max_parallel=2
+        )
+
+    assert ret == [42, 43, 44]
+    assert fake_acquire_db_conn.acquired == 3
+    assert fake_acquire_db_conn.released == 3
+    assert fake_acquire_db_conn.max_concurrent == 2
+
+
+@pytest.mark.pureunit
+@pytest.mark.asyncio
+async def test_gather_db_queries_no_queries():
+    assert await gather_db_queries(MagicMock(), Settings(), []) == []
+
+
+@pytest.mark.pureunit
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    ["max_size", "max_concurrent"],
+    [
+        (4, 3),
+        (2, 1),
+        (1, 1),
+    ],
+)
+async def test_gather_db_queries_capped_by_pool_max_size(max_size, max_concurrent):
+    fake_acquire_db_conn = FakeAcquireDbConn()
+    queries = [gather_db_queries_test_query(x, delay=0.01) for x in range(5)]
+
+    with patch("fastapi_oracle.core.acquire_db_conn", fake_acquire_db_conn):
+        ret = await gather_db_queries(
+            gather_db_queries_test_pool(max_size), Settings(), queries
+        )
+
+    assert ret == list(range(5))
+    assert fake_acquire_db_conn.max_concurrent == max_concurrent
+
+
+@pytest.mark.pureunit
+@pytest.mark.asyncio
+async def test_gather_db_queries_failed():
+    fake_acquire_db_conn = FakeAcquireDbConn()
+    queries = [
+        gather_db_queries_test_query(42, delay=1),
+        gather_db_queries_test_query(43, exc=DatabaseError("footastic")),
+        gather_db_queries_test_query(44, delay=1),
+    ]
+
+    with patch("fastapi_oracle.core.acquire_db_conn", fake_acquire_db_conn):
+        with pytest.raises(DatabaseError) as exc_info:
+            await gather_db_queries(gather_db_queries_test_pool(), Settings(), queries)
+
+    assert "footastic" in str(exc_info.value)
+    assert fake_acquire_db_conn.acquired == 3
+    assert fake_acquire_db_conn.released == 3
+
+
+@pytest.mark.pureunit
+@pytest.mark.asyncio
+async def test_gather_db_queries_not_connected():
+    pool = FakeDbPool([MagicMock(), MagicMock()])
+    queries = [
+        gather_db_queries_test_query(42),
+        gather_db_queries_test_query(
+            43, exc=DatabaseError("DPY-1001: not connected to database")
+        ),
+    ]
+
+    with patch.dict("fastapi_oracle.pools.DB_SESSION_CALLBACKS", {}, clear=True):
+        with pytest.raises(DatabaseError) as exc_info:
+            await gather_db_queries(pool, Settings(), queries)
+
+    # Only errors from releasing the connection get suppressed, not query errors
+    assert "not connected" in str(exc_info.value)
+    assert pool.busy == 0
+
+
+@pytest.mark.pureunit
+@pytest.mark.asyncio
+async def test_gather_db_queries_release_not_connected():
+    conns = [MagicMock(), MagicMock()]
+    pool = FakeDbPool(conns)
+    conns[1].close.side_effect = DatabaseError("DPY-1001: not connected to database")
+    queries = [gather_db_queries_test_query(42), gather_db_queries_test_query(43)]
+
+    with patch.dict("fastapi_oracle.pools.DB_SESSION_CALLBACKS", {}, clear=True):
+        assert await gather_db_queries(pool, Settings(), queries) == [42, 43]
+
+
+@pytest.mark.pureunit
+@pytest.mark.asyncio
+async def test_gather_db_queries_timed_out():
+    fake_acquire_db_conn = FakeAcquireDbConn()
+    queries = [
+        gather_db_queries_test_query(42),
+        gather_db_queries_test_query(43, delay=1),
+        gather_db_queries_test_query(44, delay=1),
+    ]
+
+    with patch("fastapi_oracle.core.acquire_db_conn", fake_acquire_db_conn):
+        with pytest.raises(asyncio.TimeoutError) as exc_info:
+            await gather_db_queries(
+                gather_db_queries_test_pool(),
+                Settings(db_fan_out_max_parallel=2),
+                queries,
+                timeout_secs=0.05,
+            )
+
+    assert "2 of 3 database queries did not finish" in str(exc_info.value)
+    assert fake_acquire_db_conn.acquired == 3
+    assert fake_acquire_db_conn.released == 3
+    assert fake_acquire_db_conn.max_concurrent == 2
+
+
 @pytest.mark.database
 def test_endpoint_with_db_query(client: TestClient):  # pragma: no cover
     response = client.get("/")
@@ -0,0 +1,301 @@
+import asyncio
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+from fastapi import BackgroundTasks, Depends, FastAPI
+from fastapi.testclient import TestClient
+
+from fastapi_oracle.config import Settings
+from fastapi_oracle.deadlines import (
+    DB_DEADLINE,
+    DbDeadlineMiddleware,
+    apply_db_deadline,
+    db_deadline,
+    get_db_deadline_remaining_secs,
+    with_db_deadline,
+)
+from fastapi_oracle.errors import DbDeadlineExceededError
+
+
+@pytest.mark.pureunit
+def test_db_deadline():
+    assert get_db_deadline_remaining_secs() is None
+
+    with db_deadline(10):
+        remaining_secs = get_db_deadline_remaining_secs()
+        assert remaining_secs is not None
+        assert 9 < remaining_secs <= 10
+
+        # Deadlines never get extended
+        with db_deadline(20):
+            remaining_secs = get_db_deadline_remaining_secs()
+            assert remaining_secs is not None
+            assert remaining_secs <= 10
+
+        with db_deadline(1):
+            remaining_secs = get_db_deadline_remaining_secs()
+            assert remaining_secs is not None
+            assert remaining_secs <= 1
+
+        with db_deadline(None):
+            remaining_secs = get_db_deadline_remaining_secs()
+            assert remaining_secs is not None
+            assert 1 < remaining_secs <= 10
+
+    assert get_db_deadline_remaining_secs() is None
+
+
+@pytest.mark.pureunit
+@pytest.mark.asyncio
+@patch(
+    "fastapi_oracle.deadlines.get_settings",
+    return_value=Settings(db_request_timeout_secs=5),
+)
+async def test_with_db_deadline(mock_get_settings):
+    async def _run(timeout_secs):
+        # Run in a copy of the context, the same as FastAPI does for each request
+        await with_db_deadline(timeout_secs)()
+        return get_db_deadline_remaining_secs()
+
+    remaining_secs = await asyncio.create_task(_run(None))
+    assert remaining_secs is not None
+    assert 4 < remaining_secs <= 5
+
+    remaining_secs = await asyncio.create_task(_run(2))
+    assert remaining_secs is not None
+    assert 1 < remaining_secs <= 2
+
+    assert get_db_deadline_remaining_secs() is None
+
+
+@pytest.mark.pureunit
+def test_apply_db_deadline_without_deadline():
+    conn = MagicMock()
+    conn.call_timeout = 3000
+
+    apply_db_deadline(conn)
+    assert conn.call_timeout == 3000
+
+    apply_db_deadline(conn, 0)
+    assert conn.call_timeout == 0
+
+
+@pytest.mark.pureunit
+def test_apply_db_deadline():
+    conn = MagicMock()
+    conn.call_timeout = 0
+
+    with db_deadline(10):
+        apply_db_deadline(conn, 3000)
+        assert conn.call_timeout == 3000
+
+        apply_db_deadline(conn, 0)
+        assert 9000 < conn.call_timeout <= 10000
+
+        apply_db_deadline(conn)
+        assert 9000 < conn.call_timeout <= 10000
+
+        apply_db_deadline(conn, 20000)
+        assert 9000 < conn.call_timeout <= 10000
+
+
+@pytest.mark.pureunit
+def test_apply_db_deadline_nested():
+    conn = MagicMock()
+    conn.call_timeout = 0
+    apply_db_deadline(conn, 20000)
+
+    with db_deadline(10):
+        apply_db_deadline(conn)
+        assert 9000 < conn.call_timeout <= 10000
+
+        with db_deadline(0.5):
+            apply_db_deadline(conn)
+            assert conn.call_timeout <= 500
+
+        # The inner deadline doesn't carry over to the rest of the outer one
+        apply_db_deadline(conn)
+        assert 9000 < conn.call_timeout <= 10000
+
+    apply_db_deadline(conn)
+    assert conn.call_timeout == 20000
+
+
+@pytest.mark.pureunit
+def test_apply_db_deadline_passed():
+    conn = MagicMock()
+    conn.call_timeout = 0
+    token = DB_DEADLINE.set(0.0)
+
+    try:
+        with pytest.raises(DbDeadlineExceededError) as exc_info:
+            apply_db_deadline(conn)
+    finally:
+        DB_DEADLINE.reset(token)
+
+    assert "deadline for database calls has passed" in str(exc_info.value)
+    assert conn.call_timeout == 0
+
+
+def deadline_middleware_test_app(delay=0.0):
+    state = {}
+
+    async def app(scope, receive, send):
+        state["remaining_secs"] = get_db_deadline_remaining_secs()
+        state["message"] = await receive()
+        await asyncio.sleep(delay)
+        await send({"type": "http.response.start", "status": 200})
+        state["done"] = True
+
+    return app, state
+
+
+def deadline_middleware_test_receive(*messages, delay=0.0):
+    queue = list(messages)
+
+    async def receive():
+        if not queue:
+            await asyncio.sleep(3600)
+
+        message = queue.pop(0)
+
+        if message["type"] == "http.disconnect":
+            await asyncio.sleep(delay)
+
+        return message
+
+    return receive
+
+
+@pytest.mark.pureunit
+@pytest.mark.asyncio
+async def test_db_deadline_middleware():
+    app, state = deadline_middleware_test_app()
+    receive = deadline_middleware_test_receive({"type": "http.request", "body": b""})
+    send = AsyncMock()
+
+    await DbDeadlineMiddleware(app, timeout_secs=5)({"type": "http"}, receive, send)
+
+    assert 4 < state["remaining_secs"] <= 5
+    assert state["message"] == {"type": "http.request", "body": b""}
+    assert state["done"]
+    send.assert_awaited_once()
+
+
+@pytest.mark.pureunit
+@pytest.mark.asyncio
+@patch("fastapi_oracle.deadlines.get_settings", return_value=Settings())
+async def test_db_deadline_middleware_client_disconnected(mock_get_settings):
+    app, state = deadline_middleware_test_app(delay=1)
+    receive = deadline_middleware_test_receive(
+        {"type": "http.request", "body": b""},
+        {"type": "http.disconnect"},
+        delay=0.01,
+    )
+    send = AsyncMock()
+
+    await DbDeadlineMiddleware(app)({"type": "http"}, receive, send)
+
+    assert state["remaining_secs"] is None
+    assert "done" not in state
+    send.assert_not_called()
+
+
+@pytest.mark.pureunit
+@pytest.mark.asyncio
+async def test_db_deadline_middleware_disconnect_after_response():
+    state = {}
+
+    async def app(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200})
+        await send({"type": "http.response.body", "body": b"", "more_body": False})
+        state["message"] = await receive()
+        await asyncio.sleep(0.02)
+        state["done"] = True
+
+    receive = deadline_middleware_test_receive({"type": "http.disconnect"})
+    send = AsyncMock()
+
+    await DbDeadlineMiddleware(app, timeout_secs=5)({"type": "http"}, receive, send)
+
+    assert state["message"] == {"type": "http.disconnect"}
+    assert state["done"]
+    assert send.await_count == 2
+
+
+@pytest.mark.pureunit
+def test_db_deadline_middleware_work_after_response():
+    done = []
+
+    async def slow_dependency():
+        yield
+        await asyncio.sleep(0.02)
+        done.append("dependency")
+
+    async def slow_background_task():
+        await asyncio.sleep(0.02)
+        done.append("background")
+
+    app = FastAPI()
+    app.add_middleware(DbDeadlineMiddleware, timeout_secs=5)
+
+    @app.get("/")
+    async def read_foo(background_tasks: BackgroundTasks, _=Depends(slow_dependency)):
+        background_tasks.add_task(slow_background_task)
+        return {}
+
+    with TestClient(app) as client:
+        for _ in range(3):
+            assert client.get("/").status_code == 200
+
+    assert done.count("dependency") == 3
+    assert done.count("background") == 3
+
+
+@pytest.mark.pureunit
+@pytest.mark.asyncio
+async def test_db_deadline_middleware_not_cancelling_on_disconnect():
+    app, state = deadline_middleware_test_app()
+    receive = deadline_middleware_test_receive({"type": "http.disconnect"})
+    send = AsyncMock()
+
+    await DbDeadlineMiddleware(app, timeout_secs=5, cancel_on_disconnect=False)(
+        {"type": "http"}, receive, send
+    )
+
+    assert state["message"] == {"type": "http.disconnect"}
+    assert state["done"]
+
+
+@pytest.mark.pureunit
+@pytest.mark.asyncio
+async def test_db_deadline_middleware_not_http():
+    app, state = deadline_middleware_test_app()
+    receive = deadline_middleware_test_receive({"type": "lifespan.startup"})
+
+    await DbDeadlineMiddleware(app, timeout_secs=5)(
+        {"type": "lifespan"}, receive, AsyncMock()
+    )
+
+    assert state["remaining_secs"] is None
+    assert state["done"]
+
+
+@pytest.mark.pureunit
+@pytest.mark.asyncio
+async def test_db_deadline_middleware_cancelled():
+    app, state = deadline_middleware_test_app(delay=1)
+    receive = deadline_middleware_test_receive({"type": "http.request", "body": b""})
+    task = asyncio.create_task(
+        DbDeadlineMiddleware(app, timeout_secs=5)(
+            {"type": "http"}, receive, AsyncMock()
+        )
+    )
+    await asyncio.sleep(0.01)
+    task.cancel()
+
+    with pytest.raises(asyncio.CancelledError):
+        await task
+
+    await asyncio.sleep(0.01)
+    assert "done" not in state
@@ -0,0 +1,130 @@
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+from pydantic import BaseModel
+
+from fastapi_oracle.config import Settings
+from fastapi_oracle.statements import (
+    execute_db_statement,
+    get_db_statement,
+    get_db_stmt_cache_size,
+    register_db_statement,
+)
+
+
+class Foo(BaseModel):
+    id: int
+    name: str
+
+
+@pytest.mark.pureunit
+@patch.dict("fastapi_oracle.statements.DB_STATEMENTS", clear=True)
+def test_register_db_statement():
+    statement = register_db_statement(
+        "list_foos", "SELECT id, name FROM foo", arraysize=500
+    )
+
+    assert get_db_statement("list_foos") == statement
+    assert statement.sql == "SELECT id, name FROM foo"
+    assert statement.arraysize == 500
+
+    # Registering the same SQL again under the same name is fine
+    register_db_statement("list_foos", "SELECT id, name FROM foo")
+
+    with pytest.raises(ValueError) as exc_info:
+        register_db_statement("list_foos", "SELECT id FROM foo")
+
+    assert 'Statement "list_foos" is already registered' in str(exc_info.value)
+
+
+@pytest.mark.pureunit
+@patch.dict("fastapi_oracle.statements.DB_STATEMENTS", clear=True)
+def test_get_db_statement_not_registered():
+    with pytest.raises(KeyError) as exc_info:
+        get_db_statement("list_moos")
+
+    assert 'Statement "list_moos" is not registered' in str(exc_info.value)
+
+
+@pytest.mark.pureunit
+@patch.dict("fastapi_oracle.statements.DB_STATEMENTS", clear=True)
+def test_get_db_stmt_cache_size():
+    assert get_db_stmt_cache_size(Settings()) is None
+
+    register_db_statement("list_foos", "SELECT id, name FROM foo")
+    register_db_statement("get_foo", "SELECT id, name FROM foo WHERE id = :id")
+
+    assert get_db_stmt_cache_size(Settings()) == 22
+    assert get_db_stmt_cache_size(Settings(db_stmt_cache_size=100)) == 100
+
+
+@pytest.mark.asyncio
+@pytest.mark.pureunit
+@patch.dict("fastapi_oracle.statements.DB_STATEMENTS", clear=True)
+async def test_execute_db_statement():
+    register_db_statement(
+        "get_foo",
+        "SELECT id, name FROM foo WHERE id = :id",
+        bind_types={"id": int},
+        arraysize=1,
+        prefetchrows=2,
+        row_model=Foo,
+    )
+    cursor = MagicMock(arraysize=100, prefetchrows=3)
+    cursor.description = [["ID"], ["NAME"]]
+    fetch_sizes_at_execute = []
+
+    async def execute(*args):
+        fetch_sizes_at_execute.append((cursor.arraysize, cursor.prefetchrows))
+
+    cursor.execute = AsyncMock(side_effect=execute)
+
+    await execute_db_statement(cursor, "get_foo", {"id": 42})
+
+    cursor.setinputsizes.assert_called_once_with(id=int)
+    cursor.execute.assert_awaited_once_with(
+        "SELECT id, name FROM foo WHERE id = :id", {"id": 42}
+    )
+    assert fetch_sizes_at_execute == [(1, 2)]
+
+    # The cursor's own fetch sizes are put back, for the next statement that uses it
+    assert cursor.arraysize == 100
+    assert cursor.prefetchrows == 3
+    assert cursor.rowfactory(42, "Foo") == Foo(id=42, name="Foo")
+
+
+@pytest.mark.asyncio
+@pytest.mark.pureunit
+@patch.dict("fastapi_oracle.statements.DB_STATEMENTS", clear=True)
+async def test_execute_db_statement_positional_bind_types():
+    register_db_statement(
+        "update_foo", "UPDATE foo SET name = :1 WHERE id = :2", bind_types=[str, int]
+    )
+    cursor = MagicMock()
+    cursor.execute = AsyncMock()
+    cursor.description = None
+
+    await execute_db_statement(cursor, "update_foo", ["Foo", 42])
+
+    cursor.setinputsizes.assert_called_once_with(str, int)
+    cursor.execute.assert_awaited_once_with(
+        "UPDATE foo SET name = :1 WHERE id = :2", ["Foo", 42]
+    )
+
+
+@pytest.mark.asyncio
+@pytest.mark.pureunit
+@patch.dict("fastapi_oracle.statements.DB_STATEMENTS", clear=True)
+@patch("fastapi_oracle.statements.execute_and_commit")
+async def test_execute_db_statement_commit(mock_execute_and_commit):
+    register_db_statement("delete_foo", "DELETE FROM foo WHERE id = :id")
+    cursor = MagicMock()
+    cursor.execute = AsyncMock()
+    cursor.description = None
+
+    await execute_db_statement(cursor, "delete_foo", {"id": 42}, commit=True)
+
+    mock_execute_and_commit.assert_awaited_once_with(
+        cursor, "DELETE FROM foo WHERE id = :id", {"id": 42}
+    )
+    cursor.execute.assert_not_called()
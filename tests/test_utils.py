@@ -1,15 +1,23 @@
+from types import SimpleNamespace
 from unittest.mock import AsyncMock, MagicMock
 
 import pytest
+from oracledb import DatabaseError, DbObject, DbObjectType
+from pydantic import BaseModel
 
 from fastapi_oracle.errors import (
     CursorRecordCharacterEncodingError,
     RecordAttributeCharacterEncodingError,
 )
 from fastapi_oracle.utils import (
+    build_db_coll,
+    clear_db_object_plans,
     coll_records_as_dicts,
+    coll_records_as_rows,
     cursor_rows_as_dicts,
     cursor_rows_as_gen,
+    db_object_as_python,
+    execute_and_commit,
     result_keys_to_lower,
 )
 
@@ -23,6 +31,40 @@ def test_cursor_rows_as_dicts():
     assert row_as_dict == {"do": 111, "re": 222, "mi": 333}
 
 
+@pytest.mark.asyncio
+@pytest.mark.pureunit
+async def test_execute_and_commit():
+    cursor = MagicMock()
+    cursor.connection.autocommit = False
+    autocommit_when_executed = []
+    cursor.execute = AsyncMock(
+        side_effect=lambda *args: autocommit_when_executed.append(
+            cursor.connection.autocommit
+        )
+    )
+
+    await execute_and_commit(cursor, "UPDATE foo SET name = :1", ["Foo"])
+
+    cursor.execute.assert_awaited_once_with("UPDATE foo SET name = :1", ["Foo"])
+    assert autocommit_when_executed == [True]
+    assert cursor.connection.autocommit is False
+
+    cursor.execute.side_effect = DatabaseError("footastic")
+
+    with pytest.raises(DatabaseError):
+        await execute_and_commit(cursor, "UPDATE foo SET name = :1", ["Foo"])
+
+    assert cursor.connection.autocommit is False
+
+    # Autocommit that was already on is left on
+    cursor.execute.side_effect = None
+    cursor.connection.autocommit = True
+
+    await execute_and_commit(cursor, "UPDATE foo SET name = :1", ["Foo"])
+
+    assert cursor.connection.autocommit is True
+
+
 @pytest.mark.asyncio
 @pytest.mark.pureunit
 async def test_cursor_rows_as_gen():
@@ -130,6 +172,206 @@ def test_coll_records_as_dicts_with_dodgy_windows_1252_encoding():
     )
 
 
+def db_object_test_type(name, attr_types=None, element_type=None, impl=None):
+    db_object_type = MagicMock(spec=DbObjectType)
+    db_object_type._impl = impl or object()
+    db_object_type.schema = "FOOSCHEMA"
+    db_object_type.package_name = "FOO_PKG"
+    db_object_type.name = name
+    db_object_type.iscollection = element_type is not None
+    db_object_type.element_type = element_type
+    db_object_type.attributes = []
+
+    for attr_name, attr_type in (attr_types or {}).items():
+        type_attr = MagicMock()
+        type_attr.name = attr_name
+        type_attr.type = attr_type
+        db_object_type.attributes.append(type_attr)
+
+    return db_object_type
+
+
+def db_object_test_coll(coll_type, elements):
+    coll = MagicMock()
+    coll.type = coll_type
+    coll.aslist.return_value = elements
+    return coll
+
+
+def db_object_test_nested_coll():
+    moo_type = db_object_test_type("MOO", {"ID": None})
+    moo_coll_type = db_object_test_type("MOO_TAB", element_type=moo_type)
+    number_coll_type = db_object_test_type("NUMBER_TAB", element_type=None)
+    number_coll_type.iscollection = True
+    foo_type = db_object_test_type(
+        "FOO",
+        {
+            "ID": None,
+            "MOO": moo_type,
+            "MOOS": moo_coll_type,
+            "NUMBERS": number_coll_type,
+        },
+    )
+    foo_coll_type = db_object_test_type("FOO_TAB", element_type=foo_type)
+
+    foo1 = SimpleNamespace(
+        ID=1,
+        MOO=SimpleNamespace(ID=11),
+        MOOS=db_object_test_coll(
+            moo_coll_type, [SimpleNamespace(ID=12), SimpleNamespace(ID=13)]
+        ),
+        NUMBERS=db_object_test_coll(number_coll_type, [14, 15]),
+    )
+    foo2 = SimpleNamespace(ID=2, MOO=None, MOOS=None, NUMBERS=None)
+
+    return db_object_test_coll(foo_coll_type, [foo1, None, foo2])
+
+
+@pytest.mark.pureunit
+def test_db_object_as_python():
+    coll = db_object_test_nested_coll()
+
+    assert db_object_as_python(coll) == [
+        {
+            "ID": 1,
+            "MOO": {"ID": 11},
+            "MOOS": [{"ID": 12}, {"ID": 13}],
+            "NUMBERS": [14, 15],
+        },
+        None,
+        {"ID": 2, "MOO": None, "MOOS": None, "NUMBERS": None},
+    ]
+
+    # Converting again uses the cached plan, and gets the same result
+    assert db_object_as_python(coll)[0]["MOOS"] == [{"ID": 12}, {"ID": 13}]
+
+
+@pytest.mark.pureunit
+def test_db_object_as_python_tuples_and_records():
+    coll = db_object_test_nested_coll()
+
+    assert db_object_as_python(coll, row_type="tuple") == [
+        (1, (11,), [(12,), (13,)], [14, 15]),
+        None,
+        (2, None, None, None),
+    ]
+
+    records = db_object_as_python(coll, row_type="record")
+    assert records[0].ID == 1
+    assert records[0].MOO.ID == 11
+    assert [moo.ID for moo in records[0].MOOS] == [12, 13]
+    assert records[0].NUMBERS == [14, 15]
+    assert type(records[0]).__name__ == "FOO"
+
+
+@pytest.mark.pureunit
+def test_db_object_as_python_records_with_odd_type_names():
+    foo_type = db_object_test_type("FOO$REC", {"ID": None, "MOO#": None})
+    moo_type = db_object_test_type("1MOO", {"ID": None})
+
+    foo = db_object_as_python(
+        SimpleNamespace(type=foo_type, ID=1, **{"MOO#": 2}), row_type="record"
+    )
+    assert type(foo).__name__ == "FOO_REC"
+    assert foo == (1, 2)
+
+    moo = db_object_as_python(SimpleNamespace(type=moo_type, ID=3), row_type="record")
+    assert type(moo).__name__ == "_1MOO"
+    assert moo.ID == 3
+
+
+@pytest.mark.pureunit
+def test_db_object_as_python_same_type_name():
+    # Same-named types of two DBs, or of one DB before and after the type got changed
+    foo_type = db_object_test_type("FOO", {"ID": None})
+    other_foo_type = db_object_test_type("FOO", {"ID": None, "NAME": None})
+
+    assert db_object_as_python(SimpleNamespace(type=foo_type, ID=1)) == {"ID": 1}
+    assert db_object_as_python(
+        SimpleNamespace(type=other_foo_type, ID=2, NAME="Foo")
+    ) == {"ID": 2, "NAME": "Foo"}
+
+    # Another wrapper of the same type description uses the cached plan
+    same_foo_type = db_object_test_type("FOO", {}, impl=foo_type._impl)
+    assert db_object_as_python(SimpleNamespace(type=same_foo_type, ID=3)) == {"ID": 3}
+
+
+@pytest.mark.pureunit
+def test_coll_records_as_dicts_nested():
+    coll = db_object_test_nested_coll()
+    foo1 = coll.aslist()[0]
+
+    # Nested records and collections are left as they are by default
+    dicts = list(coll_records_as_dicts(coll))
+    assert dicts[0]["MOO"] is foo1.MOO
+    assert dicts[0]["MOOS"] is foo1.MOOS
+
+    dicts = list(coll_records_as_dicts(coll, nested=True))
+    assert dicts[0]["MOO"] == {"ID": 11}
+    assert dicts[0]["MOOS"] == [{"ID": 12}, {"ID": 13}]
+
+
+@pytest.mark.pureunit
+def test_coll_records_as_rows():
+    foo_type = db_object_test_type("FOO", {"DO": None, "RE": None})
+    coll = db_object_test_coll(
+        db_object_test_type("FOO_TAB", element_type=foo_type),
+        [SimpleNamespace(DO=111, RE=222), SimpleNamespace(DO=333)],
+    )
+
+    assert list(coll_records_as_rows(coll)) == [(111, 222), (333, None)]
+
+
+class BuildFoo(BaseModel):
+    id: int
+    moo: dict | None = None
+    numbers: list[int] | None = None
+
+
+def db_object_test_buildable_type(name, attr_types=None, element_type=None):
+    db_object_type = db_object_test_type(name, attr_types, element_type)
+    db_object_type.newobject.side_effect = lambda *args: (
+        list(args[0]) if args else SimpleNamespace()
+    )
+    return db_object_type
+
+
+@pytest.mark.pureunit
+def test_build_db_coll():
+    moo_type = db_object_test_buildable_type("MOO", {"ID": None})
+    number_coll_type = db_object_test_buildable_type("NUMBER_TAB")
+    number_coll_type.iscollection = True
+    foo_type = db_object_test_buildable_type(
+        "FOO", {"ID": None, "MOO": moo_type, "NUMBERS": number_coll_type}
+    )
+    foo_coll_type = db_object_test_buildable_type("FOO_TAB", element_type=foo_type)
+    existing_moo = MagicMock(spec=DbObject)
+
+    coll = build_db_coll(
+        foo_coll_type,
+        [
+            BuildFoo(id=1, moo={"id": 11}, numbers=[12, 13]),
+            None,
+            {"ID": 2, "MOO": existing_moo},
+        ],
+    )
+
+    assert coll[0].ID == 1
+    assert coll[0].MOO.ID == 11
+    assert coll[0].NUMBERS == [12, 13]
+    assert coll[1] is None
+    assert coll[2].ID == 2
+    assert coll[2].MOO is existing_moo
+    assert coll[2].NUMBERS is None
+
+    # Building again uses the cached plan, until the plans get cleared
+    foo_type.attributes.pop()
+    assert build_db_coll(foo_coll_type, [{"id": 3}])[0].NUMBERS is None
+
+    clear_db_object_plans()
+    assert not hasattr(build_db_coll(foo_coll_type, [{"id": 3}])[0], "NUMBERS")
+
+
 async def result_keys_to_lower_test_gen():
     for row in [
         {"DO": 111, "RE": 222, "MI": 333},